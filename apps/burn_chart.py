@@ -1,57 +1,95 @@
+import numpy as np
 import pandas as pd
 from datetime import date, timedelta
 from source.base import CitiBudgeting
 from source.collectors import BurnChartCollector
+from source.profiler import profiled
 pd.set_option('display.max_columns', None, 'display.expand_frame_repr', False)
 
 
 class BurnChart(CitiBudgeting):
+    """
+    Weekly budgeted vs actual fees, as (fee row x week) arrays
+        - start_week / end_week: first and last week shown, in weeks from this week's Friday (-1 is last Friday);
+          start_week=None starts from the first week of the engagement
+        - the Cumulative columns add up every week from the start of the engagement to end_week
+        - run_backfill writes the chart of every Friday from start_week to end_week, from this single parse
+    """
 
-    def __init__(self, excel, burn_chart_tab='Burn Chart', bill_tab='Bill', week=-1):
-        super().__init__(excel)
+    @profiled
+    def __init__(self, excel, burn_chart_tab='Burn Chart', bill_tab='Bill', start_week=None, end_week=-1, **kwargs):
+        super().__init__(excel, **kwargs)
         self.name = 'burn chart'
         self.app = BurnChartCollector(self.excel, burn_chart_tab, bill_tab,
-                                      date.today() + timedelta(days=4-date.today().weekday(), weeks=week))
+                                      date.today() + timedelta(days=4-date.today().weekday(), weeks=end_week))
+        self.budget = self.app.budget_actual['Budget Fees']
+        self.actual = self.app.budget_actual['Actual Fees']
+        self.adjusted = self._adjusted_actual()
+        weeks = self.budget.shape[1]
+        self.first = 0 if start_week is None else min(max(weeks - 1 - (end_week - start_week), 0), weeks)
         self.module = self._weekly_chart
 
     def run_report(self, save=True):
         super().run_report_excel(self.module, save)
 
+    def tables(self):
+        """The report as {sheet name: [(caption, table), ...]} for a ReportBook"""
+        return {'Burn Chart': [(None, self._weekly_chart())]}
+
+    def run_backfill(self, save=True, per_week=False):
+        """
+        The chart as of every Friday from start_week to end_week, each from the start of the engagement
+        Every week's figures are a prefix of the end_week arrays, so nothing is parsed or collected again.
+        Saved to one workbook with a tab per Friday, or with per_week=True to one file per Friday.
+        """
+        weeks = self.budget.shape[1]
+        charts = {(self.app.the_friday - timedelta(weeks=weeks-1-k)).isoformat(): self._weekly_chart(k + 1, first=0)
+                  for k in range(self.first, weeks)}
+        print(f'Burn charts of {len(charts)} weeks: {", ".join(charts)}')
+        if save:
+            date = self.excel.split()[-1][:4]
+            if per_week:
+                for friday, res in charts.items():
+                    file_name = f'{self.output}{self.name} {date} week {friday}.xlsx'
+                    res.to_excel(file_name)
+                    print(f'Result has been saved to {file_name}')
+            else:
+                file_name = f'{self.output}{self.name} {date} backfill.xlsx'
+                with pd.ExcelWriter(file_name) as writer:
+                    for friday, res in charts.items():
+                        res.to_excel(writer, sheet_name=friday)
+                print(f'Result has been saved to {file_name}')
+        return charts
+
     # ---------- App Functions ----------
-    def _weekly_chart(self):
-        headers = self.app.budget_actual['Headers']
+    def _weekly_chart(self, last=None, first=None):
+        # Weeks first..last of the arrays (default: the weeks of this chart), cumulated up to last
+        first = self.first if first is None else first
+        headers = self.app.budget_actual['Headers'][first:last]
         headers = [
-            [ele for t in zip(headers, [''] * len(headers)) for ele in t] + ['Cumulative', ''],
+            [ele for header in headers for ele in (header, '')] + ['Cumulative', ''],
             ['Budgeted Fees', 'Actual Fees'] * (len(headers)+1)
         ]
-
-        cum_bud = [sum(t) for t in zip(*self.app.budget_actual['Budget Fees'])]
-        cum_act = [sum(t) for t in zip(*self.app.budget_actual['Actual Fees'])]
-        cum_adj_act = [sum(t) for t in zip(*self._adjusted_actual())]
-
-        numbers = [ele
-                   for p in zip(self.app.budget_actual['Budget Fees'], self.app.budget_actual['Actual Fees'])
-                   for ele in p]
-        numbers = [list(t) for t in zip(*(numbers + [cum_bud] + [cum_act]))]
-
-        numbers_adj = [ele
-                       for p in zip(self.app.budget_actual['Budget Fees'], self._adjusted_actual())
-                       for ele in p]
-        numbers_adj = [list(t) for t in zip(*(numbers_adj + [cum_bud] + [cum_adj_act]))]
-
-        return pd.DataFrame(headers + numbers + [['']*len(headers)] + headers + numbers_adj)
+        budget, actual, adjusted = self.budget[:, :last], self.actual[:, :last], self.adjusted[:, :last]
+        numbers = self._table(budget, actual, first).tolist()
+        numbers_adj = self._table(budget, adjusted, first).tolist()
+        return pd.DataFrame(headers + numbers + [['']*len(headers[0])] + headers + numbers_adj)
 
     # ---------- Helper Functions ----------
-    def _adjusted_actual(self):
-        def adjust(act, adj):
-            res = [x for x in act]
-            res[2] = adj
-            res[0] = res[-1] - sum(res[1:-1])
-            return res
+    @staticmethod
+    def _table(budget, actual, first):
+        # budget and actual of each shown week side by side, then both cumulated to the last week
+        weeks = np.stack([budget, actual], axis=2)[:, first:].reshape(len(budget), -1)
+        cumulative = np.stack([budget.cumsum(axis=1)[:, -1], actual.cumsum(axis=1)[:, -1]], axis=1)
+        return np.hstack([weeks, cumulative])
 
+    def _adjusted_actual(self):
+        # Row 2 is re-costed as bill rate x hours; row 0 absorbs the change so that the total (last row) holds
         bill_rate, hours = self.app.budget_actual['Bill Rate and Hours']
-        return [adjust(act, sum([r[0]*h for r, h in zip(bill_rate, hour)]))
-                for act, hour in zip(self.app.budget_actual['Actual Fees'], hours)]
+        adjusted = self.actual.copy()
+        adjusted[2] = bill_rate @ hours[:, :adjusted.shape[1]]
+        adjusted[0] = adjusted[-1] - adjusted[1:-1].sum(axis=0)
+        return adjusted
 
 
 if __name__ == "__main__":
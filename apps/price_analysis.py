@@ -1,17 +1,23 @@
+import itertools
+import numpy as np
 import pandas as pd
 from source.base import CitiBudgeting
 from source.collectors import PricingAnalysisCollector
+from source.profiler import profiled
+from source.what_if import WhatIf
 
 pd.set_option('display.max_columns', None, 'display.expand_frame_repr', False)
 
 
 class PricingAnalysis(CitiBudgeting):
 
-    def __init__(self, excel, tab_1='Gignow', tab_2='Tech'):
-        super().__init__(excel)
+    @profiled
+    def __init__(self, excel, tabs=('Gignow', 'Tech'), **kwargs):
+        super().__init__(excel, **kwargs)
         self.name = 'pricing analysis'
-        self.tab_1 = PricingAnalysisCollector(self.excel, tab_1)
-        self.tab_2 = PricingAnalysisCollector(self.excel, tab_2)
+        self.scenarios = [PricingAnalysisCollector(self.excel, tab) for tab in tabs]
+        self.teams = [self._team_table(scenario.pricing['Team'], scenario.pricing['Hours'])
+                      for scenario in self.scenarios]
         self.modules = [self._total_impact,
                         self._change_log,
                         self._impact_by_activity_code]
@@ -19,118 +25,126 @@ class PricingAnalysis(CitiBudgeting):
     def run_report(self, save=True):
         super().run_report_txt(self.modules, save)
 
+    def tables(self):
+        """The report as {sheet name: [(caption, table), ...]} for a ReportBook"""
+        changes = []
+        for k, before, after, (added, modified, switched) in self._changes():
+            changes += [(f'2.{k} {before} -> {after}: new people added', added),
+                        (f'2.{k} {before} -> {after}: records who modify hours', modified),
+                        (f'2.{k} {before} -> {after}: records who switch activity code', switched)]
+        return {'Total Impact': [(None, self._total_impact_table())],
+                'Change Log': changes,
+                'Impact by Activity Code': [(None, self._impact_table())]}
+
+    def what_if(self, variants, scenario=-1):
+        """WhatIf.evaluate of {label: [change, ...]} on one of the scenarios, by default the last one"""
+        return WhatIf(self.scenarios[scenario]).evaluate(variants)
+
     # ---------- App Functions ----------
     def _total_impact(self):
-        columns = ['Scenario', 'Total Fees Discounted', 'Remaining Fee including Gignow', 'Margin (%) with Gignow']
-        scenario_1 = list(map(lambda x: self.tab_1.pricing[x], columns))
-        scenario_2 = list(map(lambda x: self.tab_2.pricing[x], columns))
         return f"""
 1. Total Impact for Project:
-{pd.DataFrame([scenario_1, scenario_2], columns=columns)}
+{self._total_impact_table()}
 """
 
     def _change_log(self):
-        columns = ['Name', 'Level', 'Activity Code', 'Discounted Rate', 'Base Cost', 'Date_Gignow', 'Date_Tech',
-                   'Hours_Gignow', 'Hours_Tech', 'Delta_Fees']
-        team_1 = self.tab_1.pricing['Team']
-        team_2 = self.tab_2.pricing['Team']
-
-        def log_1():
-            guys = [x for x in team_2 if x[0] not in [y[0] for y in team_1]]
-            res = [ls[:5] + ['N/A', f'{str(ls[5])[:10]} - {str(ls[6])[:10]}', 'N/A',
-                             ' '.join(sorted([str(x) for x in set(ls[8:]) if x > 0])), ls[7]] for ls in guys]
-            return pd.DataFrame(res, columns=columns)
-
-        def log_2():
-            guys = [(y, x) for x in team_2 for y in team_1 if x[0] == y[0] and x[2] == y[2] and
-                    any([a-b for a, b in zip([a if a > 0 else 0 for a in x[8:]], [b if b > 0 else 0 for b in y[8:]])])]
-            res = [t[:5] + [f'{str(g[5])[:10]} - {str(g[6])[:10]}',
-                            f'{str(t[5])[:10]} - {str(t[6])[:10]}',
-                            ' '.join(sorted([str(x) for x in set(g[8:]) if x > 0])),
-                            ' '.join(sorted([str(x) for x in set(t[8:]) if x > 0])),
-                            t[7] - g[7]] for g, t in guys]
-            return pd.DataFrame(res, columns=columns)
-
-        def log_3():
-            guys = set()
-            res = []
-            for x in team_2:
-                for y in team_1:
-                    if x[0] == y[0] and x[2] != y[2]:  # get a different code!
-                        # check if this guy is already addressed
-                        if x[0] in guys:
-                            continue
-                        else:  # collect all info about this guy
-                            guys.add(x[0])
-                            after = [n for n in team_2 if n[0] == x[0]]
-                            before = [m for m in team_1 if m[0] == x[0]]
-                            codes = set([n[2] for n in after] + [m[2] for m in before])
-                            items = []
-                            for code in codes:
-                                # if same hours then don't show
-                                if any([n[2] == code for n in after]) and not any([m[2] == code for m in before]):
-                                    ls = [n for n in after if n[2] == code][0]
-                                    if ls[7] != 0:
-                                        items.append(ls[:5] +
-                                                     ['N/A', f'{str(ls[5])[:10]} - {str(ls[6])[:10]}',
-                                                      'N/A', ' '.join(sorted([str(x) for x in set(ls[8:]) if x > 0])),
-                                                      ls[7]])
-                                elif not any([n[2] == code for n in after]) and any([m[2] == code for m in before]):
-                                    ls = [m for m in before if m[2] == code][0]
-                                    if ls[7] != 0:
-                                        items.append(ls[:5] +
-                                                     [f'{str(ls[5])[:10]} - {str(ls[6])[:10]}', 'N/A',
-                                                      ' '.join(sorted([str(x) for x in set(ls[8:]) if x > 0])), 'N/A',
-                                                      ls[7]])
-                                else:
-                                    t = [n for n in after if n[2] == code][0]
-                                    g = [m for m in before if m[2] == code][0]
-                                    if t[7] != g[7]:
-                                        items.append(t[:5] + [f'{str(g[5])[:10]} - {str(g[6])[:10]}',
-                                                              f'{str(t[5])[:10]} - {str(t[6])[:10]}',
-                                                              ' '.join(sorted([str(x) for x in set(g[8:]) if x > 0])),
-                                                              ' '.join(sorted([str(x) for x in set(t[8:]) if x > 0])),
-                                                              t[7] - g[7]])
-                            if len(items) > 1:
-                                res.extend(items)
-            return pd.DataFrame(res, columns=columns)
-
-        return f"""
-2. Change Log:
+        logs = []
+        for k, before, after, (added, modified, switched) in self._changes():
+            logs.append(f"""
+2.{k} {before} -> {after}
 
-2.1 Following are the new people added:
-{log_1() if log_1().shape[0] else 'NO NEWLY ADDED PEOPLE!'}
+2.{k}.1 Following are the new people added:
+{added if added.shape[0] else 'NO NEWLY ADDED PEOPLE!'}
 
-2.2 Followings are the records who modify hours:
-{log_2() if log_2().shape[0] else 'NO ONE MODIFIED HOURS!'}
+2.{k}.2 Followings are the records who modify hours:
+{modified if modified.shape[0] else 'NO ONE MODIFIED HOURS!'}
 
-2.3 Followings are the records who switch activity code:
-{log_3() if log_3().shape[0] else 'NO ONE SWITCHED ACTIVITY CODE!'}
-"""
+2.{k}.3 Followings are the records who switch activity code:
+{switched if switched.shape[0] else 'NO ONE SWITCHED ACTIVITY CODE!'}
+""")
+        return '\n2. Change Log:\n' + ''.join(logs)
 
     def _impact_by_activity_code(self):
-        columns = ['Activity Code', self.tab_1.pricing['Scenario'], self.tab_2.pricing['Scenario']]
-
-        def sum_up(codes, fees):
-            df = pd.DataFrame([[c[0], f[0]] for c, f in zip(codes, fees)], columns=['Code', 'Fees'])
-            df = df.groupby('Code').sum()
-            return df
-
-        g = sum_up(self.tab_1.pricing['Activity Code'], self.tab_1.pricing['All Fees Discounted']).reset_index()
-        t = sum_up(self.tab_2.pricing['Activity Code'], self.tab_2.pricing['All Fees Discounted']).reset_index()
-        res = g.merge(t, on='Code')
-
-        res.columns = columns
-        res['Fee Difference'] = res[columns[2]] - res[columns[1]]
-
-        res['dummy'] = range(len(res))
-        res.iloc[int(res[res['Activity Code'] == 'Total'].index.values), 4] = len(res)
-        res = res.sort_values("dummy").reset_index(drop='True').drop('dummy', axis=1)
         return f"""
 3.Impact by Activity Code:
-{res}
+{self._impact_table()}
 """
 
+    # ---------- Helper Functions ----------
+    def _total_impact_table(self):
+        columns = ['Scenario', 'Total Fees Discounted', 'Remaining Fee including Gignow', 'Margin (%) with Gignow']
+        return pd.DataFrame([[s.pricing[x] for x in columns] for s in self.scenarios], columns=columns)
+
+    def _changes(self):
+        # (k, before, after, (added, modified, switched)) of every pair of scenarios, numbered from 1
+        for k, (i, j) in enumerate(itertools.combinations(range(len(self.scenarios)), 2), start=1):
+            before, after = self.scenarios[i].name, self.scenarios[j].name
+            yield k, before, after, self._diff_teams(self.teams[i], self.teams[j], before, after)
+
+    def _impact_table(self):
+        names = [s.name for s in self.scenarios]
+        stack = pd.concat([s.pricing['Fees by Activity Code'].assign(Scenario=s.name) for s in self.scenarios])
+        res = stack.pivot_table(index='Activity Code', columns='Scenario', values='Fees', aggfunc='sum')
+        res = res[names].dropna()
+        for name in names[1:]:
+            res['Fee Difference' if len(names) == 2 else f'Fee Difference ({name})'] = res[name] - res[names[0]]
+        res = res.loc[sorted(res.index, key=lambda code: code == 'Total')].reset_index()
+        res.columns.name = None
+        return res
+
+    @staticmethod
+    def _team_table(team, hours):
+        # The collector's team with the text columns of the change log, and Row: the team's row in hours
+        df = team.assign(Dates=team['Start Date'].dt.strftime('%Y-%m-%d') + ' - ' +
+                         team['End Date'].dt.strftime('%Y-%m-%d'))
+        df['Hours'] = [' '.join(sorted({f'{x:g}' for x in row[row > 0]})) for row in hours]
+        df['Row'] = range(len(df))
+        return df, hours
+
+    @staticmethod
+    def _diff_teams(before, after, name_1, name_2):
+        """
+        Keyed diff of two staffing scenarios (named name_1 and name_2) on (Name, Activity Code)
+            - added: people only in after
+            - modified: the same (Name, Activity Code) in both, with different weekly hours
+            - switched: people whose activity codes differ between the two, with every code that changed fees
+        """
+        (team_1, hours_1), (team_2, hours_2) = before, after
+        key = ['Name', 'Activity Code']
+        columns = ['Name', 'Level', 'Activity Code', 'Discounted Rate', 'Base Cost', f'Date_{name_1}', f'Date_{name_2}',
+                   f'Hours_{name_1}', f'Hours_{name_2}', 'Delta_Fees']
+        info = ['Level', 'Discounted Rate', 'Base Cost']
+        head = ['Name', 'Level', 'Activity Code', 'Discounted Rate', 'Base Cost']
+
+        added = team_2[~team_2['Name'].isin(team_1['Name'])].assign(Before='N/A', Delta_Fees=lambda x: x['Fees'])
+        added = added[head + ['Before', 'Dates', 'Before', 'Hours', 'Delta_Fees']]
+
+        pairs = team_2.merge(team_1, on=key, suffixes=('', '_1')).sort_values(['Row', 'Row_1'])
+        weeks = min(hours_1.shape[1], hours_2.shape[1])
+        changed = (hours_2[pairs['Row'], :weeks] != hours_1[pairs['Row_1'], :weeks]).any(axis=1)
+        modified = pairs[changed].assign(Delta_Fees=lambda x: x['Fees'] - x['Fees_1'])
+        modified = modified[head + ['Dates_1', 'Dates', 'Hours_1', 'Hours', 'Delta_Fees']]
+
+        codes = team_1.groupby('Name')['Activity Code'].agg(['nunique', 'first']).join(
+            team_2.groupby('Name')['Activity Code'].agg(['nunique', 'first']), how='inner', rsuffix='_2')
+        movers = codes.index[(codes['nunique'] > 1) | (codes['nunique_2'] > 1) | (codes['first'] != codes['first_2'])]
+        order = {name: i for i, name in enumerate(team_2.loc[team_2['Name'].isin(movers), 'Name'].unique())}
+        firsts = [team[team['Name'].isin(movers)].drop_duplicates(key) for team in (team_1, team_2)]
+        moves = firsts[1].merge(firsts[0], on=key, how='outer', suffixes=('', '_1'), indicator=True)
+        for col in info:
+            moves[col] = moves[col].where(moves['_merge'] != 'right_only', moves[f'{col}_1'])
+        texts = ['Dates', 'Hours', 'Dates_1', 'Hours_1']
+        moves[texts] = moves[texts].fillna('N/A')
+        moves['Delta_Fees'] = np.select([moves['_merge'] == 'both', moves['_merge'] == 'left_only'],
+                                        [moves['Fees'] - moves['Fees_1'], moves['Fees']], moves['Fees_1'])
+        moves = moves[np.where(moves['_merge'] == 'both', moves['Fees'] != moves['Fees_1'],
+                               moves['Fees'].fillna(moves['Fees_1']) != 0)]
+        moves = moves[moves.groupby('Name')['Name'].transform('size') > 1]
+        moves = moves.assign(Order=moves['Name'].map(order)).sort_values(['Order', 'Activity Code'], kind='mergesort')
+        switched = moves[head + ['Dates_1', 'Dates', 'Hours_1', 'Hours', 'Delta_Fees']]
+
+        return [pd.DataFrame(df.values.tolist(), columns=columns) for df in (added, modified, switched)]
+
 
 if __name__ == "__main__":
     pass
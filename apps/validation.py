@@ -1,104 +1,159 @@
-import os
+from collections import defaultdict
 import numpy as np
 import pandas as pd
-import openpyxl
 from source.base import CitiBudgeting
+from source.refresh import refresh_timesheets
+from source.snapshots import SnapshotStore, WeekCache
+from source.summary import HoursSummary
+from source.workbook import Workbook
+from source.profiler import profiled
 
 
 class Validator(CitiBudgeting):
 
-    def __init__(self, excel, raw_tab='TimeAndExpenseDetails', staffing_tab='Tech', bill_tab='Bill'):
-        super().__init__(excel)
+    @profiled
+    def __init__(self, excel, raw_tab='TimeAndExpenseDetails', staffing_tab='Tech', bill_tab='Bill', refresh=False,
+                 **kwargs):
+        super().__init__(excel, **kwargs)
         self.name = 'report'
         self.names = self._process_names(bill_tab)
-        # self.refresh_log = self._refresh_raw(raw_tab)
-        self.ts_df, self.ts_summary = self._process_raw(raw_tab)
-        self.staffing_df, self.staffing_summary = self._process_staffing(staffing_tab)
+        self.refresh_log = self._refresh_raw(raw_tab) if refresh else ''
+        self.unnamed = []
+        self.ts_df, self.charged = self._process_raw(raw_tab)
+        self.staffing_df, self.budgeted = self._process_staffing(staffing_tab)
+        self._summary = None
         self.total = None
+        self.discrepancies = None
+        self.date = self.excel.split()[-1][:4]
+        self.snapshots = SnapshotStore(self.output + '.snapshots/')
+        self.weeks = WeekCache(self.output + '.weeks/')
         self.functions = [self._get_summary, self._get_charging_diffs]
 
+    @property
+    def summary(self):
+        """HoursSummary of the budgeted and charged hours, built once"""
+        if self._summary is None:
+            self._summary = HoursSummary(self.budgeted, self.charged, codes=self.staffing_df['Activity Code'])
+        return self._summary
+
+    @property
+    def ts_summary(self):
+        return self._nest(self.charged)
+
+    @property
+    def staffing_summary(self):
+        return self._nest(self.budgeted)
+
     def run_report(self, save=True):
-        super().run_report_txt(self.functions, save)
+        # With save=False nothing is written to the output folder, the snapshot and week cache included
+        if not save:  # computed here without saving, the report then finds every week in memory
+            self.get_discrepancies(save=False)
+        super().run_report_txt(self.functions, save, prefix=self.refresh_log + self._get_name_warnings())
+        if save:
+            self.save_snapshot()
 
     def run_comparison(self, old_file, save=True):
-        if self.total is not None:
-            self._get_summary()
-        old = Validator(old_file)
-        old._get_summary()
-        diff = (self.total.subtract(old.total, fill_value=0)).applymap(lambda x: np.nan if x == 0 else x).dropna(
-            how='all').dropna(how='all', axis=1).fillna('')
+        old_excel, old_total, diff = self._compare(old_file)
+        diff = diff.fillna('')
         msg = f"""
 #### Comparison with Old Spreedsheet #### 
 {self.excel}
 {self.total}
 
-{old.excel}
-{old.total}
+{old_excel}
+{old_total}
 
 Delta
 {diff}
 """
-        print(msg)
+        if self.echo:
+            print(msg)
         if save:
-            file_name = f'{self.output}Comparison {self.excel.split()[-1][:4]} and {old.excel.split()[-1][:4]}.txt'
+            file_name = f'{self.output}Comparison {self.date} and {old_file.split()[-1][:4]}.txt'
             with open(file_name, 'w+') as f:
                 f.write(msg)
             print(f'Result has been saved to {file_name}')
         return msg
 
+    def run_trend(self, save=True):
+        if self.total is None:
+            self._summarize()
+        self.save_snapshot()
+        trend = self.snapshots.trend()
+        msg = f"""
+#### Total Charged Hours by Tracker ####
+{trend}
+"""
+        if self.echo:
+            print(msg)
+        if save:
+            file_name = f'{self.output}Trend {self.date}.txt'
+            with open(file_name, 'w+') as f:
+                f.write(msg)
+            print(f'Result has been saved to {file_name}')
+        return trend
+
+    def tables(self, old_file=None):
+        """The report as {sheet name: [(caption, table), ...]} for a ReportBook, compared with old_file if given"""
+        budget, total, diff = self._summarize()
+        self.discrepancies = self.get_discrepancies()
+        res = {'Summary': [('Total budget hours by Activity Codes by week', budget.reset_index()),
+                           ('Total charged hours by Activity Codes by week', total.reset_index()),
+                           ('Unbudgeted hours charged', diff.reset_index())],
+               'Discrepancies': [(None, self.discrepancies)]}
+        if self.unnamed:
+            res['Name Warnings'] = [("The following people don't have a preferred name in record. "
+                                     "Processed as Legal Name instead:", pd.DataFrame({'Legal Name': self.unnamed}))]
+        if old_file:
+            old_excel, old_total, delta = self._compare(old_file)
+            res['Comparison'] = [(self.excel, total.reset_index()), (old_excel, old_total.reset_index()),
+                                 ('Delta', delta.reset_index())]
+        self.save_snapshot()
+        return res
+
+    def save_snapshot(self, discrepancies=True):
+        if self.total is None:
+            self._summarize()
+        tables = {
+            'total': self.total,
+            'charged': self.charged,
+            'budgeted': self.budgeted
+        }
+        if discrepancies:
+            tables['discrepancies'] = self.get_discrepancies() if self.discrepancies is None else self.discrepancies
+        self.snapshots.save(SnapshotStore.key(self.excel), tables)
+        return tables
+
     # ---------- App Functions ----------
     def _refresh_raw(self, raw_tab):
-        # Currently not in use because of bug.
-        # Bug: after rewriting, other tabs are affected. pd.read_excel header has issues. Can't call by value.
-        time_sheets = os.listdir(self.input + self.time_exp)
-        if time_sheets:
-            file_name = sorted(time_sheets)[-1]
-
-            ts_wb = openpyxl.load_workbook(filename=self.input+self.time_exp+file_name)
-            ws = ts_wb.worksheets[0]
-
-            tracker_wb = openpyxl.load_workbook(filename=self.excel)
-            tracker_wb.remove(tracker_wb.get_sheet_by_name(raw_tab))
-            new_tab = tracker_wb.create_sheet(raw_tab)
-
-            for row in ws:
-                for cell in row:
-                    if cell.row > 4:
-                        new_tab[f'{cell.column_letter}{cell.row-4}'].value = cell.value
-            tracker_wb.save(self.excel)
-
-            res = f"Refreshed the {raw_tab} tab by {file_name}.\n\n"
-        else:
-            res = f"No files found in {self.time_exp} folder. Proceed without refresh.\n\n"
-        return res
+        # Appends only the new weeks of the latest export in the TimeExp folder; the other tabs are left as they are
+        return refresh_timesheets(self.excel, self.input + self.time_exp, raw_tab)
+
+    def _get_name_warnings(self):
+        if not self.unnamed:
+            return ''
+        names = '\n'.join([f'    {name}' for name in self.unnamed])
+        return f"""
+#### WARNING ####
+The following people don't have a preferred name in record. Processed as Legal Name instead:
+{names}
+"""
 
     def _get_summary(self):
-        min_week = str(min(self.ts_summary.keys()))[:10]
-        max_week = str(max(self.ts_summary.keys()))[:10]
-
-        total = pd.pivot_table(self.ts_df, values='Charged Hours',
-                               index=['Activity Code Description'],
-                               columns=['Week Ending Date'],
-                               aggfunc=np.sum).fillna(0)
-        total.columns = [str(x)[:10] for x in total.columns]
-
-        budget = self.staffing_df.iloc[:-1, :len(total.columns) + 2].groupby('Activity Code').sum()
-        diff = (budget - total).applymap(lambda x: min(x, 0)).applymap(lambda x: np.nan if x == 0 else x). \
-            dropna(how='all').dropna(how='all', axis=1).fillna('')
+        weeks = self.charged.index.unique('Week')
+        min_week = str(min(weeks))[:10]
+        max_week = str(max(weeks))[:10]
+        budget, total, diff = self._summarize()
+        diff = diff.fillna('')
         if len(diff) > 0:
             msg = f'Attention: Found unbudgeted hours charged:\n{diff}'
         else:
             msg = f'Great! All charged hours are under budget!'
 
-        total.loc['Total'] = total.sum()
-        total['Total'] = total.sum(axis=1)
-        budget.loc['Total'] = budget.sum()
-        budget['Total'] = budget.sum(axis=1)
-
         pd.set_option('display.max_columns', None, 'display.expand_frame_repr', False)
         res = f"""
 #### 1. SUMMARY ####
-Currently {len(self.ts_summary)} weeks of timesheets have been recorded (from {min_week} to {max_week}). 
+Currently {len(weeks)} weeks of timesheets have been recorded (from {min_week} to {max_week}). 
 
 Total budget hours by Activity Codes by week:
 {budget}
@@ -108,58 +163,63 @@ Total charged hours by Activity Codes by week:
 
 {msg}
 """
-        self.total = total
         return res
 
+    def _summarize(self):
+        # Budget and charged hours by activity code by week with totals, and the unbudgeted hours (NaN if none).
+        # Not taken from the week cache: the pivot costs about as much as fingerprinting the weeks would.
+        self.total = self.summary.table(self.summary.charged)
+        return self.summary.table(self.summary.budget), self.total, self.summary.table(self.summary.unbudgeted, False)
+
+    def _compare(self, old_file):
+        # (old tracker path, its total table, change in charged hours since, NaN where unchanged)
+        if self.total is None:
+            self._summarize()
+        old_excel = self.input + old_file
+        old = self.snapshots.load(SnapshotStore.key(old_excel), source=old_excel)
+        if old is None:  # only the totals are compared: the old tracker's discrepancies are not worked out
+            app = Validator(old_file, input_dir=self.input, output_dir=self.output)
+            old = app.save_snapshot(discrepancies=False)
+        diff = self.total.subtract(old['total'], fill_value=0)
+        diff = diff.mask(diff == 0).dropna(how='all').dropna(how='all', axis=1)
+        return old_excel, old['total'], diff
+
+    def get_discrepancies(self, lines=False, save=True):
+        """
+        Every (week, name, activity code) whose charged hours differ from budget, in the weeks with timesheets
+            - Discrepancy: 'Over-charge' or 'Under-charge'
+            - Possibly Wrong Code: the person both over- and under-charged that week
+            - Line (with lines=True): the row as worded in the report
+        Weeks are independent of each other: the ones whose hours did not change since an earlier run come from
+        the week cache, and only the others are computed (and written to the cache, unless save is False).
+        """
+        weeks = self.charged.index.unique('Week')
+        fingerprints = self.weeks.fingerprints(self.charged, self.budgeted[self.budgeted.index.get_level_values(
+            'Week').isin(weeks)])
+        cached = {week: self.weeks.get(week, fingerprints[week]) for week in weeks}
+        dirty = [week for week in weeks if cached[week] is None]
+        if dirty:
+            fresh = self._discrepancies(dirty)
+            for week in dirty:
+                cached[week] = fresh[fresh['Week'] == week].reset_index(drop=True)
+                self.weeks.put(week, fingerprints[week], cached[week])
+            if save:
+                self.weeks.save()
+        res = [cached[week] for week in sorted(weeks) if len(cached[week])]
+        res = pd.concat(res, ignore_index=True) if res else self._discrepancies([])
+        return res if lines else res.drop(columns='Line')
+
     def _get_charging_diffs(self):
-        charged = self.ts_summary
-        budget = self.staffing_summary
-        over_charge_list = []
-        under_charge_list = []
-        wrong_code_list = []
-        for date in charged:
-            over_charge = []
-            under_charge = []
-            wrong_code = []
-            for name in set(charged[date].keys()).union(set(budget[date].keys())):
-                if name in budget[date] and name in charged[date]:
-                    diff = {}
-                    for ws in set(charged[date][name].keys()).union(set(budget[date][name].keys())):
-                        diff[ws] = charged[date][name].get(ws, 0) - budget[date][name].get(ws, 0)
-                    over_charge.extend(
-                        [(name, ws, budget[date][name].get(ws, 0), charged[date][name][ws]) for ws, hrs in
-                         diff.items() if hrs > 0])
-                    under_charge.extend(
-                        [(name, ws, budget[date][name][ws], charged[date][name].get(ws, 0)) for ws, hrs in
-                         diff.items() if hrs < 0])
-                elif name in budget[date]:
-                    under_charge.extend(
-                        [(name, ws, budget[date][name][ws], 0) for ws, hrs in budget[date][name].items()])
-                else:
-                    over_charge.extend(
-                        [(name, ws, 0, charged[date][name][ws]) for ws, hrs in charged[date][name].items()])
-
-                if name in [r[0] for r in over_charge] and name in [r[0] for r in under_charge]:
-                    over = [r for r in over_charge if r[0] == name]
-                    under = [r for r in under_charge if r[0] == name]
-                    wrong_code.extend(
-                        [f'    {name} charged {r[3]} hours on {r[1]}, with {r[2]} hours on budget.' for r in over])
-                    wrong_code.extend(
-                        [f'    {name} charged {r[3]} hours on {r[1]}, with {r[2]} hours on budget.' for r in under])
-
-            if over_charge:
-                over_charge_list.append(f'\nWeek {date}')
-                over_charge_list.extend(
-                    [f'    {r[0]} charged {r[3]} hours on {r[1]}, with {r[2]} hours on budget.' for r in
-                     over_charge])
-            if under_charge:
-                under_charge_list.append(f'\nWeek {date}')
-                under_charge_list.extend(
-                    [f'    {r[0]} charged {r[3]} hours on {r[1]}, with {r[2]} hours on budget.' for r in
-                     under_charge])
-            if wrong_code:
-                wrong_code_list.append(f'\nWeek {date}')
-                wrong_code_list.extend(wrong_code)
+        df = self.get_discrepancies(lines=True)
+        self.discrepancies = df.drop(columns='Line')
+
+        def render(rows):
+            return [line for week, lines in rows.groupby('Week')['Line'] for line in [f'\nWeek {week}'] + list(lines)]
+
+        over_charge_list = render(df[df['Discrepancy'] == 'Over-charge'])
+        under_charge_list = render(df[df['Discrepancy'] == 'Under-charge'])
+        wrong_code = df[df['Possibly Wrong Code']].sort_values(['Week', 'Name', 'Discrepancy'], kind='mergesort')
+        wrong_code_list = render(wrong_code)
 
         if over_charge_list:
             msg = '\n'.join(over_charge_list)
@@ -189,54 +249,63 @@ Total charged hours by Activity Codes by week:
         return res
 
     # ---------- Helper Functions ----------
-    def _process_raw(self, raw_tab):
-        df = pd.read_excel(self.excel, sheet_name=raw_tab)
-        df = df.groupby(['Week Ending Date', 'Employee Name', 'Activity Code Description']).sum().reset_index()
-        df = df[df['Charged Hours'] != 0].iloc[:, [0, 1, 2, 6]]
-        df = df[df['Week Ending Date'] >= '2020-03-06']
-        df['Name'] = df.apply(lambda x: self._get_name(x['Employee Name']), axis=1)
-
-        summary = {}
-        for date in df['Week Ending Date'].unique():
-            summary[str(date)[:10]] = {}
-            for r in df[df['Week Ending Date'] == date].to_dict('records'):
-                if r['Name'] in summary[str(date)[:10]]:
-                    summary[str(date)[:10]][r['Name']][r['Activity Code Description']] = r['Charged Hours']
-                else:
-                    summary[str(date)[:10]][r['Name']] = {r['Activity Code Description']: r['Charged Hours']}
-        return df, summary
-
-    def _process_names(self, bill_tab):
-        df = pd.read_excel(self.excel, sheet_name=bill_tab, header=3)[['Name', 'Legal Name']].drop_duplicates().dropna(how='all')
+    def _discrepancies(self, weeks):
+        hours = pd.concat([self.budgeted.rename('Budgeted Hours'), self.charged.rename('Charged Hours')], axis=1)
+        hours = hours[hours.index.get_level_values('Week').isin(weeks)].fillna(0)
+        hours = hours[hours['Charged Hours'] != hours['Budgeted Hours']].sort_index()
+        over = hours['Charged Hours'] > hours['Budgeted Hours']
+        person = over.groupby(level=['Week', 'Name'])
+        hours['Discrepancy'] = np.where(over, 'Over-charge', 'Under-charge')
+        hours['Possibly Wrong Code'] = person.transform('any') & ~person.transform('all')
+        df = hours.reset_index()
+        df['Line'] = '    ' + df['Name'].astype(str) + ' charged ' + df['Charged Hours'].map('{:g}'.format) + \
+            ' hours on ' + df['Activity Code'].astype(str) + ', with ' + df['Budgeted Hours'].map('{:g}'.format) + \
+            ' hours on budget.'
         return df
 
-    def _get_name(self, legal_name):
-        df = self.names[self.names['Legal Name'] == legal_name]['Name'].reset_index()
-        if df.shape[0] == 0:
-            print(f'WARNING: {legal_name} doesn\'t have a preferred name in record. Processed as Legal Name instead.')
-            return legal_name
-        return df.at[0, 'Name']
+    @profiled
+    def _process_raw(self, raw_tab):
+        df = Workbook.load(self.excel).aggregate(raw_tab, ['Week Ending Date', 'Employee Name',
+                                                           'Activity Code Description'], 'Charged Hours',
+                                                 since='2020-03-06')
+        df = df[df['Charged Hours'] != 0]
+        matched = df['Employee Name'].isin(self.names.index)
+        df['Name'] = df['Employee Name'].map(self.names).where(matched, df['Employee Name'])
+        self.unnamed = sorted(df.loc[~matched, 'Employee Name'].unique())
+
+        hours = df.groupby([df['Week Ending Date'].astype(str).str[:10], 'Name', 'Activity Code Description'])
+        charged = hours['Charged Hours'].sum()
+        charged.index.names = ['Week', 'Name', 'Activity Code']
+        return df, charged
+
+    @profiled
+    def _process_names(self, bill_tab):
+        df = self.read_sheet(bill_tab, header=3)[['Name', 'Legal Name']].drop_duplicates().dropna(how='all')
+        # legal name -> the first preferred name on record
+        return df.dropna(subset=['Legal Name']).drop_duplicates('Legal Name').set_index('Legal Name')['Name']
 
+    @profiled
     def _process_staffing(self, staffing_tab):
-        df_l = pd.read_excel(self.excel, sheet_name=staffing_tab, header=2)[['Activity Code', 'Name']]\
+        df_l = self.read_sheet(staffing_tab, header=2)[['Activity Code', 'Name']]\
             .dropna(how='all').iloc[:-1, :].fillna('No Name')
-        df_r = pd.read_excel(self.excel, sheet_name=staffing_tab, header=1).iloc[1:df_l.shape[0]+1, 18:]\
+        df_r = self.read_sheet(staffing_tab, header=1).iloc[1:df_l.shape[0]+1, 18:]\
             .reset_index(drop=True).fillna(0)
         df_r.columns = [str(x)[:10] for x in df_r.columns]
         df = pd.concat([df_l, df_r], axis=1)
-        summary = df_r.to_dict()
-        keys = {i: [d['Name'], d['Activity Code']] for i, d in enumerate(df_l.to_dict('records'))}
-        for date in summary:
-            temp = {}
-            for i in summary[date]:
-                if summary[date][i] == 0:
-                    continue
-                if keys[i][0] in temp:
-                    temp[keys[i][0]][keys[i][1]] = summary[date][i]
-                else:
-                    temp[keys[i][0]] = {keys[i][1]: summary[date][i]}
-            summary[date] = temp
-        return df, summary
+        hours = df_r.set_axis(pd.MultiIndex.from_arrays([df_l['Name'].values, df_l['Activity Code'].values]), axis=0)
+        hours = hours.stack()
+        hours = hours[hours != 0]
+        budgeted = hours.groupby(level=[2, 0, 1]).sum()
+        budgeted.index.names = ['Week', 'Name', 'Activity Code']
+        return df, budgeted
+
+    @staticmethod
+    def _nest(hours):
+        # {week: {name: {activity code: hours}}} view of a (week, name, activity code) Series
+        summary = defaultdict(dict)
+        for (week, name, code), hrs in hours.items():
+            summary[week].setdefault(name, {})[code] = hrs
+        return summary
 
 
 if __name__ == "__main__":
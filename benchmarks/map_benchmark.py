@@ -0,0 +1,59 @@
+"""
+Map construction benchmark: the array-backed Map against the original dict-of-cells build.
+Run from the project root:  python -m benchmarks.map_benchmark [rows] [cols]
+"""
+import sys
+import time
+import numpy as np
+import pandas as pd
+from source.utils import Map
+
+
+class LegacyMap:
+    # The original Map build: one df.iloc call per cell, then a Python loop to bucket and sort positions.
+
+    def __init__(self, df):
+        self.df = df
+        row, col = df.shape
+        self.loc = {(i, j): df.iloc[i, j] for i in range(row) for j in range(col)}
+        self.finder = {}
+        for loc in self.loc:
+            if self.loc[loc] is None:
+                continue
+            self.finder.setdefault(self.loc[loc], []).append(loc)
+        for val in self.finder:
+            self.finder[val].sort()
+
+
+def make_sheet(rows, cols, seed=0):
+    rng = np.random.default_rng(seed)
+    labels = np.array([f'Label {i}' for i in range(500)], dtype=object)
+    data = {}
+    for j in range(cols):
+        if j % 3 == 0:
+            column = labels[rng.integers(0, len(labels), rows)]
+        else:
+            column = rng.integers(0, 200, rows).astype(float)
+        column[rng.random(rows) < 0.3] = np.nan
+        data[j] = column
+    return pd.DataFrame(data)
+
+
+def timed(build, df):
+    start = time.perf_counter()
+    build(df)
+    return time.perf_counter() - start
+
+
+def main(rows=2000, cols=300):
+    df = make_sheet(rows, cols)
+    new = timed(Map, df)
+    old = timed(LegacyMap, df)
+    print(f'Map construction on a {rows}x{cols} sheet:')
+    print(f'    legacy dict build: {old:8.3f}s')
+    print(f'    array-backed Map:  {new:8.3f}s')
+    print(f'    speedup:           {old / new:8.1f}x')
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,115 @@
+"""
+Timings of Map construction, of the three apps and of a batch of what-if variants on synthetic trackers.
+Run from the project root:  python -m benchmarks.suite [--sizes small medium large] [--repeat 3]
+Every run is saved to output/benchmarks/<time>.json and compared against the previous run found there.
+"""
+import io
+import os
+import sys
+import json
+import random
+import shutil
+import time
+import argparse
+import tempfile
+import contextlib
+from datetime import date, timedelta
+from apps import Validator, PricingAnalysis, BurnChart
+from source.utils import Map
+from source.workbook import Workbook
+from benchmarks.tracker import make_tracker, scenario_tabs
+
+SIZES = {
+    'small': {'employees': 20, 'weeks': 31, 'codes': 4, 'scenarios': 2},
+    'medium': {'employees': 100, 'weeks': 60, 'codes': 8, 'scenarios': 3},
+    'large': {'employees': 400, 'weeks': 120, 'codes': 12, 'scenarios': 4},
+}
+TRACKER = 'Budget Tracker 1005.xlsx'
+
+
+def cases(folder, size):
+    # (name, callable) of everything timed on one tracker; each case parses the tracker itself and writes to output/
+    scenarios = scenario_tabs(size['scenarios'])
+    last_week = make_tracker(os.path.join(folder, TRACKER), **size).date()
+    this_friday = date.today() + timedelta(days=4 - date.today().weekday())
+    end_week = -((this_friday - last_week).days // 7)
+    kwargs = {'input_dir': folder + os.sep, 'output_dir': os.path.join(folder, 'output', '')}
+    return [
+        ('Map', lambda: [Map(Workbook.load(os.path.join(folder, TRACKER)).sheet(tab, header=None))
+                         for tab in ['Bill', 'Burn Chart'] + scenarios]),
+        ('Validator', lambda: Validator(TRACKER, **kwargs).run_report()),
+        ('PricingAnalysis', lambda: PricingAnalysis(TRACKER, tabs=scenarios, **kwargs).run_report()),
+        ('BurnChart', lambda: BurnChart(TRACKER, end_week=end_week, **kwargs).run_report()),
+        ('WhatIf', lambda: what_if(PricingAnalysis(TRACKER, tabs=scenarios, **kwargs))),
+    ]
+
+
+def what_if(app, variants=500, seed=0):
+    # A batch of random rate changes, shifts and removals on the last scenario
+    rnd = random.Random(seed)
+    names = sorted(app.scenarios[-1].pricing['Team']['Name'].unique())
+    return app.what_if({k: [('rate', rnd.sample(names, 3), rnd.choice([0.9, 0.95, 1.05])),
+                            ('shift', rnd.sample(names, 2), rnd.randint(-4, 4)),
+                            ('remove', rnd.choice(names))] for k in range(variants)})
+
+
+def timed(case, repeat, output):
+    # Best of repeat cold runs: no parsed sheet survives between runs, in memory or on disk, and each run starts
+    # from an empty output folder, without the snapshots and week cache of the previous one
+    times = []
+    for _ in range(repeat):
+        Workbook._cache.clear()
+        shutil.rmtree(output, ignore_errors=True)
+        os.makedirs(output)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            case()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run(sizes, repeat=3):
+    cache_dir, Workbook.cache_dir = Workbook.cache_dir, None
+    results = {}
+    try:
+        for name in sizes:
+            with tempfile.TemporaryDirectory() as folder:
+                for case, f in cases(folder, SIZES[name]):
+                    results[f'{name}/{case}'] = timed(f, repeat, os.path.join(folder, 'output'))
+                    print(f'{name:8}{case:17}{results[f"{name}/{case}"]:9.3f}s')
+    finally:
+        Workbook.cache_dir = cache_dir
+    return results
+
+
+def compare(results, previous):
+    print(f'\nAgainst the previous run ({previous["created"]}):')
+    for case, seconds in results.items():
+        if case in previous['results']:
+            print(f'    {case:26}{previous["results"][case]:9.3f}s -> {seconds:9.3f}s '
+                  f'({seconds / previous["results"][case]:5.2f}x)')
+
+
+def main(sizes=('small', 'medium', 'large'), repeat=3, folder='output/benchmarks/'):
+    os.makedirs(folder, exist_ok=True)
+    runs = sorted(f for f in os.listdir(folder) if f.endswith('.json'))
+    results = run(sizes, repeat)
+    created = time.strftime('%Y-%m-%d %H:%M:%S')
+    file_name = os.path.join(folder, time.strftime('%Y%m%d-%H%M%S.json'))
+    with open(file_name, 'w+') as f:
+        json.dump({'created': created, 'python': sys.version.split()[0], 'repeat': repeat,
+                   'sizes': {name: SIZES[name] for name in sizes}, 'results': results}, f, indent=2)
+    print(f'Result has been saved to {file_name}')
+    if runs:
+        with open(os.path.join(folder, runs[-1])) as f:
+            compare(results, json.load(f))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Time Map and the apps on synthetic trackers.')
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=list(SIZES))
+    parser.add_argument('--repeat', type=int, default=3, help='runs per case; the best one is kept')
+    parser.add_argument('--output', default='output/benchmarks/', help='where the runs are saved')
+    args = parser.parse_args()
+    main(args.sizes, args.repeat, args.output)
@@ -0,0 +1,120 @@
+"""
+Synthetic 'Budget Tracker MMDD.xlsx' workbooks, laid out with the tabs and anchor labels the apps read.
+Run from the project root:  python -m benchmarks.tracker <path> [employees] [weeks] [codes] [scenarios]
+"""
+import sys
+import random
+import datetime
+import openpyxl
+
+START = datetime.datetime(2020, 3, 6)  # first week ending date of the engagement, as the collectors assume
+FEE_ROWS = ['Other', 'Expenses', 'Labor', 'Travel', 'Tech', 'Sub', 'Misc', 'Total']
+
+
+def scenario_tabs(scenarios=2):
+    """Names of the scenario tabs: 'Gignow' and 'Tech' first, as the apps expect, then 'Scenario 3', ..."""
+    return ['Gignow', 'Tech'][:scenarios] + [f'Scenario {k}' for k in range(3, scenarios + 1)]
+
+
+def make_tracker(path, employees=20, weeks=31, codes=4, scenarios=2, seed=0):
+    """
+    Write a tracker with `weeks` weeks of timesheets from START, and a staffing plan that runs 10 weeks longer
+        - TimeAndExpenseDetails: two half-rows per person, code and week, with some noise on the planned hours
+        - Bill: preferred and legal names, bill rates and the planned hours per week
+        - one Tech-like tab per scenario (see scenario_tabs), each a variation of the same staffing plan
+        - Burn Chart: budgeted and actual fees by week, and two Headcount tables
+    Some rows are off on purpose, so that the reports have something to say: one person charges under a legal
+    name missing from Bill, one charges the wrong code every 4th week, and the Tech tab has one extra person.
+    Returns the last week ending date with timesheets.
+    """
+    rnd = random.Random(seed)
+    plan_weeks = weeks + 10
+    dates = [START + datetime.timedelta(weeks=i) for i in range(plan_weeks)]
+    code_names = [f'Code {k}' for k in range(1, codes + 1)]
+    people = [(f'First{k} Last{k}', f'Last{k}, First{k}', rnd.choice(['A', 'C', 'M', 'SM']),
+               rnd.choice([150.0, 200.0, 250.0, 300.0])) for k in range(employees)]
+    staffing = {}
+    for k, (name, _, _, _) in enumerate(people):
+        staffing[name] = [(code_names[k % codes], [rnd.choice([0, 20, 40, 40, 40]) for _ in range(plan_weeks)])]
+        if k % 5 == 0:
+            staffing[name].append((code_names[(k + 1) % codes], [rnd.choice([0, 8]) for _ in range(plan_weeks)]))
+
+    book = openpyxl.Workbook(write_only=True)
+    _time_and_expense(book.create_sheet('TimeAndExpenseDetails'), people, staffing, dates[:weeks], code_names, rnd)
+    _bill(book.create_sheet('Bill'), people, staffing, dates)
+    for k, tab in enumerate(scenario_tabs(scenarios)):
+        _scenario(book.create_sheet(tab), tab, k, people, staffing, dates, code_names)
+    _burn_chart(book.create_sheet('Burn Chart'), dates)
+    book.save(path)
+    return dates[weeks - 1]
+
+
+# ---------- Helper Functions ----------
+def _time_and_expense(ws, people, staffing, dates, code_names, rnd):
+    ws.append(['Week Ending Date', 'Employee Name', 'Activity Code Description', 'Employee ID', 'Project ID',
+               'Bill Rate', 'Charged Hours', 'Transaction Type'])
+    for w, week in enumerate(dates):
+        for k, (name, legal, _, rate) in enumerate(people):
+            for code, hours in staffing[name]:
+                hrs = max(hours[w] + rnd.choice([0, 0, 0, 2, -2]), 0)
+                code = code_names[-1] if k == 3 and w % 4 == 0 else code
+                legal = 'Unknown, Person' if k == 7 else legal
+                if hrs:
+                    ws.append([week, legal, code, 1000 + k, 42, rate, hrs / 2, 'T'])
+                    ws.append([week, legal, code, 1000 + k, 42, rate, hrs / 2, 'T'])
+
+
+def _bill(ws, people, staffing, dates):
+    ws.append(['Bill'])
+    ws.append([])
+    ws.append([None] * 6 + dates)
+    ws.append(['Name', 'Legal Name', 'Level', 'Bill Rate', 'Notes', 'Bill Rate'] + ['Hours'] * len(dates))
+    for name, legal, level, rate in people:
+        ws.append([name, legal, level, rate, '', rate] +
+                  [sum(hours[w] for _, hours in staffing[name]) for w in range(len(dates))])
+
+
+def _scenario(ws, tab, k, people, staffing, dates, code_names):
+    # Scenario k discounts the rates by 5% per step and halves every 3rd person's hours, except on 'Tech'
+    discount = 1.0 if tab == 'Tech' else 1 - 0.05 * (k + 1)
+    rows = people + [('New Joiner', 'Joiner, New', 'A', 150.0)] if tab == 'Tech' else people
+    ws.append([f'{tab} Scenario'])
+    ws.append([None] * 18 + dates)
+    ws.append(['Name', 'Level', 'Activity Code', 'Discounted Rate', 'Base Cost', 'Start Date', 'End Date',
+               'Total Fees Discounted'] + [f'Field {j}' for j in range(8, 18)] + ['Hours'] * len(dates))
+    total = 0
+    for i, (name, _, level, rate) in enumerate(rows):
+        for code, hours in staffing.get(name, [(code_names[0], [40] * len(dates))]):
+            code = code_names[-1] if tab != 'Tech' and i == 2 else code
+            hours = hours if tab == 'Tech' or i % 3 else [h // 2 for h in hours]
+            fees = rate * discount * sum(hours)
+            total += fees
+            ws.append([name, level, code, rate * discount, rate / 2, dates[0], dates[-1], fees] + [None] * 10 + hours)
+    ws.append([None, None, 'Total', None, None, None, None, total])
+    ws.append([])
+    ws.append([None] * 9 + ['Remaining fee including Gignow', 12345.0])
+    ws.append([None] * 9 + ['Margin (%) with Gignow', 0.3])
+    ws.append([None] * 9 + ['Margin (%) with Gignow', 0.25 if tab == 'Tech' else 0.2])
+
+
+def _burn_chart(ws, dates):
+    ws.append(['Burn Chart'])
+    ws.append([None, None] + dates)
+    ws.append([None, None] + [f'Week {w + 1:02d}' for w in range(len(dates))])
+    for label in ['Total Budgeted Cost - Extension', 'Total Actual Cost']:
+        ws.append([label])
+        ws.append([])
+        ws.append([])
+        for i, row in enumerate(FEE_ROWS):
+            fees = [1000.0 * 7 + 10 * w if row == 'Total' else 1000.0 + 10 * w + i for w in range(len(dates))]
+            ws.append([None, row] + fees)
+        ws.append([])
+    for _ in range(2):
+        ws.append(['Headcount'] + [float(j) for j in range(2 * len(dates))])
+        for i in range(8):
+            ws.append([None] + [float(i + j) for j in range(2 * len(dates))])
+        ws.append([])
+
+
+if __name__ == "__main__":
+    make_tracker(sys.argv[1], *map(int, sys.argv[2:]))
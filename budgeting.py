@@ -1,31 +1,240 @@
+import io
+import os
+import time
+import argparse
+import traceback
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
 from apps import Validator, PricingAnalysis, BurnChart
+from source.base import CitiBudgeting
+from source.report import ReportBook
+from source.sources import Source
+from source.workbook import Workbook
+from source.profiler import profiler
 
 
 class MyBudget:
 
-    def __init__(self):
-        self.this_week = 'Budget Tracker 1005.xlsx'
-        self.last_week = 'Budget Tracker 0824.xlsx'
+    def __init__(self, this_week='Budget Tracker 1005.xlsx', last_week='Budget Tracker 0824.xlsx',
+                 input_dir='input/', output_dir='output/', apps=None, refresh=False, backfill=None,
+                 workbook=False, sources=None):
+        self.input = input_dir
+        self.output = output_dir
+        self.this_week = this_week
+        self.last_week = last_week
+        self.refresh = refresh
+        self.backfill = backfill  # None, 'workbook' or 'files'
+        self.workbook = workbook  # write every report as sheets of one workbook instead of one file per report
+        self.report = {}  # sheet name -> [(caption, table), ...], collected for that workbook
+        self.sources = sources or {}  # tab -> Source, for the tabs of this week's tracker read from other files
+        if self.sources:
+            Workbook.configure(self.input + self.this_week, self.sources)
+        self.apps = apps or ['run_validation', 'run_pricing_analysis', 'run_burn_chart']
+        # tab -> header offsets the apps read it with; the timesheet tab is streamed by Validator
+        self.sheets = {'Tech': [0, 1, 2], 'Bill': [0, 3], 'Gignow': [0], 'Burn Chart': [None]}
+        self.depends = {'run_validation': ['TimeAndExpenseDetails', 'Tech', 'Bill'],
+                        'run_pricing_analysis': ['Gignow', 'Tech'],
+                        'run_burn_chart': ['Burn Chart', 'Bill']}
 
     def run_validation(self):
-        app = Validator(self.this_week)
-        app.run_report()
-        app.run_comparison(self.last_week)
+        app = Validator(self.this_week, refresh=self.refresh, input_dir=self.input, output_dir=self.output)
+        if self.workbook:
+            self.report.update(app.tables(self.last_week))
+        else:
+            app.run_report()
+            if self.last_week:
+                app.run_comparison(self.last_week)
+        return {'Charged Hours': app.total.loc['Total', 'Total'],
+                'Over-charges': (app.discrepancies['Discrepancy'] == 'Over-charge').sum(),
+                'Under-charges': (app.discrepancies['Discrepancy'] == 'Under-charge').sum()}
 
     def run_pricing_analysis(self):
-        app = PricingAnalysis(self.this_week)
-        app.run_report()
+        app = PricingAnalysis(self.this_week, input_dir=self.input, output_dir=self.output)
+        if self.workbook:
+            self.report.update(app.tables())
+        else:
+            app.run_report()
+        return {f'Fees ({s.name})': s.pricing['Total Fees Discounted'] for s in app.scenarios}
 
     def run_burn_chart(self):
-        app = BurnChart(self.this_week)
-        app.run_report()
+        app = BurnChart(self.this_week, input_dir=self.input, output_dir=self.output)
+        if self.backfill:
+            app.run_backfill(per_week=self.backfill == 'files')
+        elif self.workbook:
+            self.report.update(app.tables())
+        else:
+            app.run_report()
+        return {'Budgeted Fees': app.budget[-1].sum(), 'Actual Fees': app.actual[-1].sum()}
 
-    def run(self):
-        self.run_validation()
-        self.run_pricing_analysis()
-        self.run_burn_chart()
+    def run(self, parallel=False):
+        if not parallel:
+            results = [self._run_app(app, capture=False) for app in self.apps]
+            self.write_report()
+            profiler.save(self.output)
+            return results
+        # Parse the tracker once here; the workers get the parsed sheets instead of the file
+        with profiler.stage('preload'):
+            Workbook.load(self.input + self.this_week).preload(self.sheets)
+        os.makedirs(self.output, exist_ok=True)  # the apps write to it concurrently
+        with ProcessPoolExecutor(len(self.apps), initializer=self._init_worker,
+                                 initargs=(self._worker_state(), Workbook._cache, Workbook._configured)) as pool:
+            results, records, reports = zip(*pool.map(self._run_in_worker, self.apps))
+        for app, output, error, _ in results:
+            print(output, end='')
+            if error:
+                print(f'ERROR: {app} failed, the other apps are not affected.\n{error}')
+        for report in reports:
+            self.report.update(report)
+        self.write_report()
+        profiler.save(self.output, profiler.drain() + [r for rs in records for r in rs])
+        return list(results)
+
+    def watch(self, interval=1.0):
+        """
+        Run the apps, then rerun the ones whose inputs change, until interrupted
+            - the files in input/ and input/TimeExp/ are polled every `interval` seconds
+            - when this week's tracker is saved, only its changed tabs are parsed again (see Workbook) and only
+              the apps that read them (self.depends) rerun
+            - a change to last week's tracker or to the timesheet exports reruns the validation
+            - a change to the file of a Source counts as a change to the tab it stands in for
+            - files are taken once they stayed the same for one interval; a failing run is retried on the next change
+        """
+        apps, tracker = self.apps, self.input + self.this_week
+        sourced = {source.path for source in self.sources.values()}
+        seen = self._input_files()
+        self._fingerprint(tracker)
+        self.run()
+        try:
+            while True:
+                time.sleep(interval)
+                files = self._input_files()
+                if files == seen:
+                    continue
+                while True:  # wait until the files are no longer being written
+                    time.sleep(interval)
+                    files, previous = self._input_files(), files
+                    if files == previous:
+                        break
+                changed = {path for path in set(files) | set(seen) if files.get(path) != seen.get(path)}
+                seen = files
+                try:
+                    tabs = Workbook.load(tracker).changed if changed & (sourced | {tracker}) else []
+                    if tabs is None:  # the previous version was never fingerprinted: assume everything changed
+                        self.apps = apps
+                    else:
+                        self.apps = [app for app in apps if set(self.depends[app]) & set(tabs) or
+                                     app == 'run_validation' and changed - sourced - {tracker}]
+                    tabs = f" (tabs: {', '.join(tabs)})" if tabs else ''
+                    print(f"\n#### {time.strftime('%H:%M:%S')} Changed: {', '.join(sorted(changed))}{tabs}; "
+                          f"rerunning {', '.join(self.apps) or 'nothing'} ####")
+                    self._fingerprint(tracker)
+                    self.run()
+                    if self.refresh:  # the refresh saved the tracker during the run: not a change to react to
+                        seen = self._input_files()
+                        self._fingerprint(tracker)
+                except Exception:
+                    print(f'ERROR: the run failed, waiting for the next change.\n{traceback.format_exc()}')
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.apps = apps
+
+    @staticmethod
+    def _fingerprint(excel):
+        # Fingerprint the current version of the tracker, so that the next saved version can tell its changed tabs
+        return Workbook.load(excel).fingerprints
+
+    def _input_files(self):
+        # {path: (mtime, size)} of the trackers, the timesheet exports and the files of the sources
+        files = {source.path: source.signature for source in self.sources.values() if os.path.isfile(source.path)}
+        for folder in [self.input, os.path.join(self.input, 'TimeExp', '')]:
+            if os.path.isdir(folder):
+                for file_name in os.listdir(folder):
+                    path = folder + file_name
+                    if os.path.isfile(path) and not file_name.startswith(('~$', '.')):
+                        stat = os.stat(path)
+                        files[path] = (stat.st_mtime, stat.st_size)
+        return files
+
+    def write_report(self):
+        """Write the sheets collected in workbook mode to '<output>budget report MMDD.xlsx'"""
+        if not self.report:
+            return None
+        book = ReportBook(f"{self.output}budget report {self.this_week.split()[-1][:4]}.xlsx")
+        book.add_sheets(self.report)
+        self.report = {}
+        return book.save()
+
+    def _run_app(self, app, capture=True):
+        """(app, console output, traceback or '', the app's key figures)"""
+        if not capture:
+            with profiler.stage(app):
+                return app, '', '', getattr(self, app)()
+        output = io.StringIO()
+        error, result = '', {}
+        with contextlib.redirect_stdout(output):
+            try:
+                with profiler.stage(app):
+                    result = getattr(self, app)()
+            except Exception:
+                error = traceback.format_exc()
+        return app, output.getvalue(), error, result
+
+    @staticmethod
+    def _worker_state():
+        # The settings of this process that a worker needs: under the spawn and forkserver start methods (macOS,
+        # Windows, Linux from Python 3.14) workers import the modules afresh instead of inheriting them
+        return Workbook.cache_dir, CitiBudgeting.echo, profiler.enabled, sorted(profiler.cprofile)
+
+    @staticmethod
+    def _init_worker(state, cache=None, configured=None):
+        # Pool initializer: apply _worker_state(), and adopt the parent's parsed workbooks if given
+        Workbook.cache_dir, CitiBudgeting.echo, enabled, cprofile = state
+        if enabled:
+            profiler.enable(cprofile)
+        if cache is not None:
+            Workbook.adopt(cache, configured)
+
+    def _run_in_worker(self, app):
+        # In a worker process: _run_app, the stages this process recorded meanwhile and the sheets it collected
+        return self._run_app(app), profiler.drain(), self.report
 
 
 if __name__ == "__main__":
-    my_budget = MyBudget()
-    my_budget.run()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--no-cache', action='store_true', help='parse the trackers without the on-disk sheet cache')
+    parser.add_argument('--cache-dir', help=f'where parsed sheets are cached (default: {Workbook.cache_dir})')
+    parser.add_argument('--refresh', action='store_true',
+                        help='append the new weeks of the latest export in input/TimeExp/ to the timesheet tab first')
+    parser.add_argument('--backfill', choices=['workbook', 'files'],
+                        help='write the burn chart of every week so far, to one workbook or to one file per week')
+    parser.add_argument('--profile', action='store_true',
+                        help='record the time and peak memory of every stage to output/profile.json')
+    parser.add_argument('--cprofile', nargs='+', default=[], metavar='STAGE',
+                        help='stages to run under cProfile as well (with --profile), e.g. Validator._process_raw')
+    parser.add_argument('--workbook', action='store_true',
+                        help="write every report as sheets of one workbook, 'budget report MMDD.xlsx'")
+    parser.add_argument('--quiet', action='store_true', help='do not print the reports to the console')
+    parser.add_argument('--watch', action='store_true',
+                        help='keep running, and rerun the apps whose input files change')
+    parser.add_argument('--parallel', action='store_true', help='run the apps concurrently in a process pool')
+    parser.add_argument('--sources', metavar='JSON',
+                        help='tabs to read from CSV, Parquet or other workbooks instead, as inline JSON or the path '
+                             'of a JSON file, e.g. the timesheet export: {"TimeAndExpenseDetails": {"path": '
+                             '"TimeExp/export.csv", "columns": {...}, "dtypes": {...}}}; paths relative to input/')
+    args = parser.parse_args()
+    if args.no_cache:
+        Workbook.cache_dir = None
+    elif args.cache_dir:
+        Workbook.cache_dir = args.cache_dir
+    if args.profile:
+        profiler.enable(args.cprofile)
+    if args.quiet:
+        CitiBudgeting.echo = False
+
+    my_budget = MyBudget(refresh=args.refresh, backfill=args.backfill, workbook=args.workbook,
+                         sources=Source.from_config(args.sources, 'input/') if args.sources else None)
+    if args.watch:
+        my_budget.watch()
+    else:
+        my_budget.run(parallel=args.parallel)
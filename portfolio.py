@@ -0,0 +1,104 @@
+import os
+import re
+import argparse
+import traceback
+import contextlib
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from budgeting import MyBudget
+from source.workbook import Workbook
+from source.profiler import profiler
+
+pd.set_option('display.max_columns', None, 'display.expand_frame_repr', False)
+
+
+class Portfolio:
+    """
+    Batch runner over every project under a directory tree
+        - a project is any folder holding 'Budget Tracker MMDD.xlsx' files; its newest tracker is this week's
+          and the one before it (if any) is compared against
+        - projects run in a process pool of at most `workers` processes
+        - each project writes to its own folder under `output`, with the console output of its apps in run.log
+        - one portfolio summary with the status and key figures of every project is written to `output`
+    """
+    tracker = re.compile(r'^Budget Tracker \d{4}\.xlsx$')
+
+    def __init__(self, root='input/', output='output/', apps=None, workers=None, workbook=False):
+        self.root = root
+        self.output = output
+        self.apps = apps
+        self.workers = workers
+        self.workbook = workbook
+
+    def discover(self):
+        projects = {}
+        for folder, dirs, files in os.walk(self.root):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+            trackers = sorted(f for f in files if self.tracker.match(f))
+            if not trackers:
+                continue
+            project = os.path.relpath(folder, self.root)
+            project = os.path.basename(os.path.abspath(self.root)) if project == '.' else project
+            projects[project] = MyBudget(this_week=trackers[-1],
+                                         last_week=trackers[-2] if len(trackers) > 1 else None,
+                                         input_dir=os.path.join(folder, ''),
+                                         output_dir=os.path.join(self.output, project, ''),
+                                         apps=self.apps,
+                                         workbook=self.workbook)
+        return projects
+
+    def run(self, save=True):
+        projects = self.discover()
+        with ProcessPoolExecutor(self.workers, initializer=MyBudget._init_worker,
+                                 initargs=(MyBudget._worker_state(),)) as pool:
+            rows = list(pool.map(run_project, projects.keys(), projects.values()))
+        res = pd.DataFrame(rows)
+        print(res)
+        if save:
+            file_name = os.path.join(self.output, 'Portfolio Summary.xlsx')
+            res.to_excel(file_name, index=False)
+            print(f'Result has been saved to {file_name}')
+        return res
+
+
+def run_project(project, my_budget):
+    os.makedirs(my_budget.output, exist_ok=True)
+    row = {'Project': project, 'Tracker': my_budget.this_week}
+    try:
+        with open(os.path.join(my_budget.output, 'run.log'), 'w+') as f:
+            for app, output, error, result in [my_budget._run_app(app) for app in my_budget.apps]:
+                f.write(output)
+                if error:
+                    f.write(f'ERROR: {app} failed.\n{error}')
+                row[app] = 'failed' if error else 'ok'
+                row.update(result)
+            try:  # a failure here fails this project, not the whole portfolio summary
+                with contextlib.redirect_stdout(f):
+                    my_budget.write_report()
+                profiler.save(my_budget.output)
+            except Exception:
+                f.write(f'ERROR: writing the report failed.\n{traceback.format_exc()}')
+                row['Report'] = 'failed'
+    finally:
+        # Workers are reused across projects: drop this project's trackers rather than keep every one seen so far
+        Workbook._cache.clear()
+    return row
+
+
+if __name__ == "__main__":
+    apps = {'validation': 'run_validation', 'pricing': 'run_pricing_analysis', 'burn_chart': 'run_burn_chart'}
+    parser = argparse.ArgumentParser(description='Run the budgeting apps for every tracker under a directory tree.')
+    parser.add_argument('root', nargs='?', default='input/', help='where to look for trackers (default: input/)')
+    parser.add_argument('--output', default='output/', help='root of the per-project output folders')
+    parser.add_argument('--apps', nargs='+', choices=list(apps), default=list(apps), help='apps to run per project')
+    parser.add_argument('--workers', type=int, help='max projects processed at once (default: CPU count)')
+    parser.add_argument('--profile', action='store_true', help="write each project's stage timings to its profile.json")
+    parser.add_argument('--workbook', action='store_true', help="write each project's reports as one workbook")
+    parser.add_argument('--no-cache', action='store_true', help='parse the trackers without the on-disk sheet cache')
+    args = parser.parse_args()
+    if args.no_cache:
+        Workbook.cache_dir = None
+    if args.profile:
+        profiler.enable()
+
+    Portfolio(args.root, args.output, [apps[a] for a in args.apps], args.workers, args.workbook).run()
@@ -1,17 +1,30 @@
+from source.workbook import Workbook
+from source.profiler import profiler
+
+
 class CitiBudgeting:
+    echo = True  # print the reports to the console as well
 
-    def __init__(self, excel):
-        self.input = 'input/'
-        self.output = 'output/'
+    def __init__(self, excel, input_dir='input/', output_dir='output/'):
+        self.input = input_dir
+        self.output = output_dir
         self.time_exp = 'TimeExp/'
         self.excel = self.input + excel
         self.name = ''
 
+    def read_sheet(self, tab, header=0):
+        return Workbook.load(self.excel).sheet(tab, header=header)
+
     def run_report_txt(self, functions, save, prefix=''):
-        res = '\n'.join([f() for f in functions])
+        res = []
+        for f in functions:
+            with profiler.stage(f.__qualname__):
+                res.append(f())
+        res = '\n'.join(res)
         if prefix:
             res = prefix + res
-        print(res)
+        if self.echo:
+            print(res)
         if save:
             file_name = f'{self.output}{self.name} {self.excel.split()[-1][:4]}.txt'
             with open(file_name, 'w+') as f:
@@ -20,10 +33,13 @@ class CitiBudgeting:
         return
 
     def run_report_excel(self, function, save):
-        res = function()
-        print(res)
+        with profiler.stage(function.__qualname__):
+            res = function()
+        if self.echo:
+            print(res)
         if save:
             file_name = f'{self.output}{self.name} {self.excel.split()[-1][:4]}.xlsx'
-            res.to_excel(file_name)
+            with profiler.stage('to_excel'):
+                res.to_excel(file_name)
             print(f'Result has been saved to {file_name}')
         return
@@ -1,25 +1,37 @@
+import numpy as np
 import pandas as pd
 import datetime
-from source.utils import Map
+from source.workbook import Workbook
+from source.profiler import profiler
 
 
 class PricingAnalysisCollector:
+    """
+    The collector of one pricing scenario tab
+        - Team: one row per staffing line with a name, with typed columns: Name, Level, Activity Code, Discounted Rate,
+          Base Cost and Fees as floats, Start Date and End Date as datetimes
+        - Hours: the weekly hours of those rows as one contiguous (row x week) float array, blanks and negatives as 0
+        - Fees by Activity Code: the Activity Code and Total Fees Discounted columns, down to the last filled row
+    """
+    team_columns = ['Name', 'Level', 'Activity Code', 'Discounted Rate', 'Base Cost', 'Start Date', 'End Date', 'Fees']
 
     def __init__(self, excel, name):
         self.name = name
-        self.raw_df = pd.read_excel(excel, sheet_name=name)
-        self.map = Map(self.raw_df)
+        with profiler.stage('map', sheet=name):
+            self.map = Workbook.load(excel).map(name)
+        self.raw_df = self.map.df
         self.pricing = self._process()
 
     def _process(self):
+        team, hours = self._team()
         res = {
             'Scenario': self.name,
             'Total Fees Discounted': self._total_fees_discounted(),
             'Remaining Fee including Gignow': self._remaining_fee_including_gignow(),
             'Margin (%) with Gignow': self._margin_pct_with_gignow(),
-            'Team': self._team(),
-            'Activity Code': self.map.get_values_below('Activity Code'),
-            'All Fees Discounted': self.map.get_values_below('Total Fees Discounted')
+            'Team': team,
+            'Hours': hours,
+            'Fees by Activity Code': self._fees_by_activity_code()
         }
         return res
 
@@ -33,11 +45,25 @@ class PricingAnalysisCollector:
         return self.map.get_value_by_direction('Margin (%) with Gignow', 1, (0,1))
 
     def _team(self):
-        names = self.map.get_values_below('Name')  # [[name, (i, j)], [], ...]
         features = ['Level', 'Activity Code', 'Discounted Rate', 'Base Cost', 'Start Date', 'End Date',
-                    'Total Fees Discounted', 'Hours']
-        columns = [j for f in features for _, j in self.map.finder[f]]
-        return [[name] + list(map(lambda j: self.map.loc[(coord[0], j)], columns)) for name, coord in names]
+                    'Total Fees Discounted']
+        columns = [self.map.find('Name')[1]] + [self.map.find(f)[1] for f in features]
+        block = self.map.get_block('Name', columns=columns + [j for _, j in self.map.finder['Hours']])
+        block = block[pd.notna(block[:, 0])]
+        team = pd.DataFrame(block[:, :8], columns=self.team_columns)
+        team['Name'] = team['Name'].astype(str)
+        for col in ['Discounted Rate', 'Base Cost', 'Fees']:
+            team[col] = pd.to_numeric(team[col], errors='coerce').astype(float)
+        for col in ['Start Date', 'End Date']:
+            team[col] = pd.to_datetime(team[col], errors='coerce')
+        hours = pd.DataFrame(block[:, 8:]).apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+        return team, np.ascontiguousarray(np.where(hours > 0, hours, 0))
+
+    def _fees_by_activity_code(self):
+        columns = [self.map.find('Activity Code')[1], self.map.find('Total Fees Discounted')[1]]
+        df = pd.DataFrame(self.map.get_block('Activity Code', columns=columns), columns=['Activity Code', 'Fees'])
+        df['Fees'] = pd.to_numeric(df['Fees'], errors='coerce').astype(float)
+        return df
 
 
 class BurnChartCollector:
@@ -51,11 +77,15 @@ class BurnChartCollector:
             - 'Headcount' is used to located the 2 output table for accumulation
         Bill Tab:
             - the 2nd 'Bill Rate' is used to locate both bill rate and hours
+    Fees and hours are kept as (row x week) arrays, from the first week to the_friday.
     """
 
     def __init__(self, excel, burn_chart_tab, bill_tab, the_friday):
-        self.bill_map = Map(pd.read_excel(excel, sheet_name=bill_tab))
-        self.burn_chart_map = Map(pd.read_excel(excel, sheet_name=burn_chart_tab, header=None))
+        workbook = Workbook.load(excel)
+        with profiler.stage('map', sheet=bill_tab):
+            self.bill_map = workbook.map(bill_tab)
+        with profiler.stage('map', sheet=burn_chart_tab):
+            self.burn_chart_map = workbook.map(burn_chart_tab, header=None)
         self.the_friday = the_friday
         self.budget_actual = self._process()
 
@@ -70,40 +100,42 @@ class BurnChartCollector:
 
     def _get_headers(self):
         r, c = self.burn_chart_map.find(pd._libs.tslibs.timestamps.Timestamp(self.the_friday))
-        week = self.burn_chart_map.loc[(r+1, c)]
+        week = int(str(self.burn_chart_map.loc[(r+1, c)]).split()[-1])  # 'Week NN', any number of digits
 
         def format_header(i):
-            wk = int(week[-2:]) - i
+            wk = week - i
             month = f"{(self.the_friday - datetime.timedelta(7*i)).strftime('%B')[:3]}"
             day = f"{(self.the_friday - datetime.timedelta(7*i)).strftime('%d')}"
             return f"Week {wk} ({month} - {day})"
 
-        return [format_header(i) for i in range(int(week[-2:]))][::-1]
+        return [format_header(i) for i in range(week)][::-1]
 
     def _get_budget_fees(self):
-        r, c_0 = self.burn_chart_map.find('Total Budgeted Cost - Extension')
-        _, c_t = self.burn_chart_map.find(pd._libs.tslibs.timestamps.Timestamp(self.the_friday))
-        return [[self.burn_chart_map.loc[(i, j)] for i in range(r+3, r+11)] for j in range(c_0+2, c_t+1)]
+        return self._get_fees('Total Budgeted Cost - Extension')
 
     def _get_actual_fees(self):
-        r, c_0 = self.burn_chart_map.find('Total Actual Cost')
+        return self._get_fees('Total Actual Cost')
+
+    def _get_fees(self, anchor):
+        # 8 rows of fees start 3 rows below the anchor; weekly columns run from 2 columns right of it to the Friday
+        _, c_0 = self.burn_chart_map.find(anchor)
         _, c_t = self.burn_chart_map.find(pd._libs.tslibs.timestamps.Timestamp(self.the_friday))
-        return [[self.burn_chart_map.loc[(i, j)] for i in range(r+3, r+11)] for j in range(c_0+2, c_t+1)]
+        return self.burn_chart_map.get_block(anchor, shape=(8, c_t-c_0-1), offset=(3, 2)).astype(float)
 
     def _get_bill_rate_and_hours(self):
-        bill_rate = self.bill_map.get_consecutive_value_below('Bill Rate', 1)
+        bill_rate = np.array([x for x, _ in self.bill_map.get_consecutive_value_below('Bill Rate', 1)], dtype=float)
+        r, c_0 = self.bill_map.find('Bill Rate', 1)
         _, c = [d for d in self.bill_map.finder[pd._libs.tslibs.timestamps.Timestamp(self.the_friday)]
-                if d[0] == bill_rate[0][1][0]-2][0]
-        hours = [[x if x > 0 else 0 for x in [self.bill_map.loc[(i, j)]
-                                              for i in [p[1][0] for p in bill_rate]]]
-                 for j in range(c-(self.the_friday-datetime.date(2020, 3, 6)).days//7, c+1)]
-        return bill_rate, hours
+                if d[0] == r-1][0]
+        weeks = (self.the_friday-datetime.date(2020, 3, 6)).days//7
+        hours = self.bill_map.get_block('Bill Rate', shape=(len(bill_rate), weeks+1), offset=(1, c-weeks-c_0), order=1)
+        return bill_rate, np.where(hours > 0, hours, 0).astype(float)
 
     def _get_prev_cumulative(self):
-        rows = [range(i+1, i+9) for i, _ in self.burn_chart_map.finder['Headcount']]
-        cols = [self.burn_chart_map.find('Headcount')[1] + j + 1 for j in range(int(self._get_headers()[-1].split()[1])*2-2)]
-        cum_1_budget = [sum([self.burn_chart_map.loc[(i, j)] for j in cols[::2]]) for i in rows[0]]
-        cum_1_actual = [sum([self.burn_chart_map.loc[(i, j)] for j in cols[1::2]]) for i in rows[0]]
-        cum_2_budget = [sum([self.burn_chart_map.loc[(i, j)] for j in cols[::2]]) for i in rows[1]]
-        cum_2_actual = [sum([self.burn_chart_map.loc[(i, j)] for j in cols[1::2]]) for i in rows[1]]
+        shape = (8, int(self._get_headers()[-1].split()[1])*2-2)
+        table_1 = self.burn_chart_map.get_block('Headcount', shape=shape, offset=(1, 1))
+        (r_1, _), (r_2, _) = self.burn_chart_map.finder['Headcount'][:2]
+        table_2 = self.burn_chart_map.get_block('Headcount', shape=shape, offset=(r_2-r_1+1, 1))
+        cum_1_budget, cum_1_actual = table_1[:, ::2].sum(axis=1).tolist(), table_1[:, 1::2].sum(axis=1).tolist()
+        cum_2_budget, cum_2_actual = table_2[:, ::2].sum(axis=1).tolist(), table_2[:, 1::2].sum(axis=1).tolist()
         return cum_1_budget, cum_1_actual, cum_2_budget, cum_2_actual
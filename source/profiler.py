@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import cProfile
+import functools
+import contextlib
+import tracemalloc
+
+
+class Profiler:
+    """
+    Wall time and peak memory of the stages of a run, off unless enabled (BUDGETING_PROFILE=1 or enable())
+        - a stage is a `with profiler.stage(name, sheet)` block, or a method decorated with @profiled
+        - stages nest: each record has the path from its app down to it, e.g. 'run_validation > Validator.__init__'
+        - peak memory is the peak of the memory allocated through Python (tracemalloc) while the stage ran
+        - the stages named in cprofile also run under cProfile; their stats are dumped beside the JSON profile
+    """
+
+    def __init__(self, enabled=False, cprofile=()):
+        self.enabled = enabled
+        self.cprofile = set(cprofile)
+        self.records = []
+        self._stack = []
+        self._stats = None
+
+    def enable(self, cprofile=()):
+        self.enabled = True
+        self.cprofile.update(cprofile)
+
+    @contextlib.contextmanager
+    def stage(self, name, sheet=None):
+        if not self.enabled:
+            yield
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if self._stack:
+            self._stack[-1]['peak'] = max(self._stack[-1]['peak'], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        frame = {'name': name, 'peak': 0, 'cprofile': name in self.cprofile and not self._profiling}
+        self._stack.append(frame)
+        if frame['cprofile']:
+            self._stats = self._stats or cProfile.Profile()
+            self._stats.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            if frame['cprofile']:
+                self._stats.disable()
+            peak = max(tracemalloc.get_traced_memory()[1], frame['peak'])
+            self.records.append({
+                'app': self._stack[0]['name'],
+                'path': ' > '.join(f['name'] for f in self._stack),
+                'stage': name,
+                'sheet': sheet,
+                'seconds': round(seconds, 6),
+                'peak_mb': round(peak / 1024 ** 2, 3),
+                'pid': os.getpid()
+            })
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+
+    def profiled(self, method):
+        """Decorator: run every call of method as a stage named after its qualified name"""
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            with self.stage(method.__qualname__):
+                return method(*args, **kwargs)
+        return wrapper
+
+    def drain(self):
+        records, self.records = self.records, []
+        return records
+
+    def save(self, folder, records=None):
+        """Write the records (default: the ones of this process, which are then cleared) to profile.json"""
+        records = self.drain() if records is None else records
+        if not self.enabled:
+            return None
+        os.makedirs(folder, exist_ok=True)
+        file_name = os.path.join(folder, 'profile.json')
+        with open(file_name, 'w+') as f:
+            json.dump({'created': time.strftime('%Y-%m-%d %H:%M:%S'), 'stages': records}, f, indent=2, default=str)
+        print(f'Profile has been saved to {file_name}')
+        if self._stats is not None:
+            self._stats.dump_stats(os.path.join(folder, 'profile.prof'))
+            print(f"cProfile stats of {', '.join(sorted(self.cprofile))} have been saved to "
+                  f"{os.path.join(folder, 'profile.prof')}")
+            self._stats = None
+        return file_name
+
+    # ---------- Helper Functions ----------
+    @property
+    def _profiling(self):
+        return any(f['cprofile'] for f in self._stack)
+
+
+profiler = Profiler(enabled=bool(os.environ.get('BUDGETING_PROFILE')),
+                    cprofile=[s for s in os.environ.get('BUDGETING_CPROFILE', '').split(',') if s])
+profiled = profiler.profiled
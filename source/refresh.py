@@ -0,0 +1,130 @@
+import os
+import re
+import datetime
+import zipfile
+from xml.sax.saxutils import escape
+import openpyxl
+from openpyxl.utils import get_column_letter
+from source.workbook import Workbook
+
+_EPOCH = datetime.datetime(1899, 12, 30)
+
+
+def refresh_timesheets(excel, time_exp, raw_tab, header_row=5):
+    """
+    Append the weeks of the newest timesheet export in time_exp that are not yet in the raw_tab of excel
+        - the export's header is on header_row; its columns are matched to the tab's header by name
+        - only rows whose 'Week Ending Date' is new are appended, in bulk; existing rows and other tabs are untouched
+    """
+    exports = sorted(f for f in os.listdir(time_exp) if f.endswith('.xlsx') and not f.startswith(('~$', '.')))
+    if not exports:
+        return f"No files found in {time_exp} folder. Proceed without refresh.\n\n"
+    file_name = exports[-1]
+
+    header, weeks = read_header_and_column(excel, raw_tab, 'Week Ending Date')
+    known = {_day(x) for x in weeks}
+    book = openpyxl.load_workbook(os.path.join(time_exp, file_name), read_only=True, data_only=True)
+    rows = book.worksheets[0].iter_rows(min_row=header_row, values_only=True)
+    columns = list(next(rows))
+    week = columns.index('Week Ending Date')
+    index = [columns.index(col) if col in columns else None for col in header]
+    new = [[row[j] if j is not None and j < len(row) else None for j in index]
+           for row in rows if row[week] is not None and _day(row[week]) not in known]
+    book.close()
+
+    if not new:
+        return f"{raw_tab} tab is up to date with {file_name}. Proceed without refresh.\n\n"
+    append_rows(excel, raw_tab, new)
+    added = sorted({_day(row[header.index('Week Ending Date')]) for row in new})
+    return f"Refreshed the {raw_tab} tab by {file_name}: {len(new)} rows added for week(s) " \
+           f"{', '.join(str(d) for d in added)}.\n\n"
+
+
+def read_header_and_column(excel, sheet_name, column):
+    book = openpyxl.load_workbook(excel, read_only=True, data_only=True)
+    rows = book[sheet_name].iter_rows(values_only=True)
+    header = list(next(rows))
+    j = header.index(column)
+    values = [row[j] for row in rows if j < len(row)]
+    book.close()
+    return header, values
+
+
+def append_rows(excel, sheet_name, rows):
+    """
+    Append rows of values below the last row of a sheet
+    The sheet's XML is edited in place inside the .xlsx package: the new rows take the cell styles of the current
+    last row, and every other part of the file is copied over unchanged. Falls back to openpyxl for sheets whose
+    XML is not laid out the way Excel and openpyxl write it.
+    """
+    with zipfile.ZipFile(excel) as package:
+        part = Workbook.sheet_parts(package)[sheet_name]
+        xml = package.read(part)
+    patched = _append_to_sheet_xml(xml, rows)
+    if patched is None:
+        book = openpyxl.load_workbook(excel)
+        for row in rows:
+            book[sheet_name].append(row)
+        book.save(excel)
+        return
+
+    temp = f'{excel}.{os.getpid()}.tmp'
+    with zipfile.ZipFile(excel) as package, zipfile.ZipFile(temp, 'w', zipfile.ZIP_DEFLATED) as out:
+        for item in package.infolist():
+            out.writestr(item, patched if item.filename == part else package.read(item.filename))
+    os.replace(temp, excel)
+
+
+# ---------- Helper Functions ----------
+def _day(value):
+    return value.date() if isinstance(value, datetime.datetime) else value
+
+
+def _append_to_sheet_xml(xml, rows):
+    end = xml.rfind(b'</sheetData>')
+    if end < 0:
+        if not re.search(rb'<sheetData\s*/>', xml):
+            return None
+        xml = re.sub(rb'<sheetData\s*/>', b'<sheetData></sheetData>', xml, count=1)
+        end = xml.rfind(b'</sheetData>')
+    start = xml.rfind(b'<row ', 0, end)
+    last, styles = 0, {}
+    if start >= 0:
+        tag = re.match(rb'<row [^>]*?\br="(\d+)"', xml[start:end])
+        if tag is None:
+            return None
+        last = int(tag.group(1))
+        for cell in re.finditer(rb'<c ([^>]*?)/?>', xml[start:end]):
+            attrs = dict(re.findall(rb'(\w+)="([^"]*)"', cell.group(1)))
+            column = re.match(rb'[A-Z]+', attrs.get(b'r', b''))
+            if column and b's' in attrs:
+                styles[column.group().decode()] = attrs[b's'].decode()
+
+    body = ''.join(_row_xml(last + i + 1, row, styles) for i, row in enumerate(rows)).encode()
+    xml = xml[:end] + body + xml[end:]
+    width = max([len(row) for row in rows] + [1])
+    return re.sub(rb'<dimension ref="([A-Z]+\d+)(?::[A-Z]+\d+)?"',
+                  lambda m: b'<dimension ref="' + m.group(1) + b':' +
+                  f'{get_column_letter(width)}{last + len(rows)}'.encode() + b'"', xml, count=1)
+
+
+def _row_xml(r, row, styles):
+    cells = []
+    for j, value in enumerate(row, start=1):
+        if value is None:
+            continue
+        column = get_column_letter(j)
+        ref = f'{column}{r}'
+        style = f' s="{styles[column]}"' if column in styles else ''
+        if isinstance(value, bool):
+            cells.append(f'<c r="{ref}"{style} t="b"><v>{int(value)}</v></c>')
+        elif isinstance(value, (int, float)):
+            cells.append(f'<c r="{ref}"{style}><v>{value!r}</v></c>')
+        elif isinstance(value, (datetime.datetime, datetime.date)):
+            value = value if isinstance(value, datetime.datetime) else datetime.datetime.combine(value, datetime.time())
+            serial = (value - _EPOCH).total_seconds() / 86400
+            cells.append(f'<c r="{ref}"{style}><v>{serial!r}</v></c>')
+        else:
+            text = escape(str(value))
+            cells.append(f'<c r="{ref}"{style} t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return f'<row r="{r}">{"".join(cells)}</row>'
@@ -0,0 +1,44 @@
+import openpyxl
+import pandas as pd
+
+
+class ReportBook:
+    """
+    One workbook holding the reports of every app, written by openpyxl in write-only mode
+        - rows go to disk as they are appended, so memory does not grow with the size of the tables
+        - a sheet is a list of blocks (caption, table): the caption row (if any), the table, then an empty row
+        - a table is a DataFrame, written with its column names unless they are the default 0..n-1, or a text
+    """
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.book = openpyxl.Workbook(write_only=True)
+        self.names = []
+
+    def add_sheet(self, name, blocks):
+        name = name[:31]  # Excel's limit on sheet names
+        self.names.append(name)
+        ws = self.book.create_sheet(name)
+        for caption, table in blocks:
+            if caption:
+                ws.append([caption])
+            if isinstance(table, str):
+                for line in table.splitlines():
+                    ws.append([line])
+            else:
+                if not isinstance(table.columns, pd.RangeIndex):
+                    ws.append([str(col) for col in table.columns])
+                values = table.to_numpy(dtype=object)
+                values[pd.isna(values)] = None
+                for row in values.tolist():
+                    ws.append(row)
+            ws.append([])
+
+    def add_sheets(self, sheets):
+        for name, blocks in sheets.items():
+            self.add_sheet(name, blocks)
+
+    def save(self):
+        self.book.save(self.file_name)
+        print(f'Result has been saved to {self.file_name}')
+        return self.file_name
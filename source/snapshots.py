@@ -0,0 +1,119 @@
+import os
+import re
+import hashlib
+import datetime
+import numpy as np
+import pandas as pd
+
+
+class SnapshotStore:
+    """
+    Compact local store of the tables a Validator run computed, one pickle per tracker date (YYYYMMDD, see key)
+        - total: charged hours by activity code by week, with Total row and column
+        - charged / budgeted: hours by (week, name, activity code)
+        - discrepancies: Validator.get_discrepancies(), except in the snapshot of a tracker only compared against
+    Comparisons and trends read these tables back instead of processing the old trackers again.
+    """
+
+    def __init__(self, folder='output/.snapshots/'):
+        self.folder = folder
+
+    @staticmethod
+    def key(excel):
+        """
+        The date of a tracker 'Budget Tracker MMDD.xlsx' as YYYYMMDD: the file name has no year, so it is taken
+        from the date the file was last saved, as the year that puts MMDD nearest to that date
+        """
+        saved = datetime.date.fromtimestamp(os.path.getmtime(excel))
+        month, day = int(excel.split()[-1][:2]), int(excel.split()[-1][2:4])
+        dates = []
+        for year in [saved.year - 1, saved.year, saved.year + 1]:
+            try:
+                dates.append(datetime.date(year, month, day))
+            except ValueError:  # 0229 outside a leap year
+                pass
+        return min(dates, key=lambda date: abs(date - saved)).strftime('%Y%m%d')
+
+    def path(self, date):
+        return os.path.join(self.folder, f'{date}.pkl')
+
+    def save(self, date, tables):
+        os.makedirs(self.folder, exist_ok=True)
+        temp = f'{self.path(date)}.{os.getpid()}.tmp'
+        pd.to_pickle(tables, temp)
+        os.replace(temp, self.path(date))
+
+    def load(self, date, source=None):
+        """The tables saved for date, or None if there are none or the source tracker changed since."""
+        path = self.path(date)
+        if not os.path.exists(path):
+            return None
+        if source and os.path.exists(source) and os.path.getmtime(source) > os.path.getmtime(path):
+            return None
+        return pd.read_pickle(path)
+
+    def dates(self):
+        if not os.path.isdir(self.folder):
+            return []
+        # snapshots named by MMDD only, from before the year was part of the key, are left out
+        return sorted(f[:-4] for f in os.listdir(self.folder) if re.fullmatch(r'\d{8}\.pkl', f))
+
+    def compare(self, new_date, old_date):
+        new, old = self.load(new_date)['total'], self.load(old_date)['total']
+        return new.subtract(old, fill_value=0)
+
+    def trend(self, dates=None, column='Total'):
+        """One column per tracker date: the given column of its total table (default: hours charged to date)."""
+        dates = dates or self.dates()
+        res = pd.concat([self.load(date)['total'][column].rename(date) for date in dates], axis=1)
+        return res.fillna(0)
+
+
+class WeekCache:
+    """
+    Per-week results of a Validator, keyed by a fingerprint of that week's charged and budgeted hours
+        - a week whose hours are the same as in an earlier run is read back instead of computed again
+        - all weeks are kept in one pickle, with the last `keep` fingerprints of each week
+    """
+
+    def __init__(self, folder='output/.weeks/', version='1', keep=2):
+        self.folder = folder
+        self.version = version  # part of every fingerprint: change it when the per-week computation changes
+        self.keep = keep
+        self._weeks = None
+
+    @property
+    def path(self):
+        return os.path.join(self.folder, 'weeks.pkl')
+
+    def fingerprints(self, *hours):
+        """{week: fingerprint} of the rows of each (week, ...) hours Series, which must be sorted by week"""
+        shas = {}
+        for k, series in enumerate(hours):
+            rows = pd.util.hash_pandas_object(series.reset_index(), index=False).to_numpy()
+            weeks, starts = np.unique(series.index.get_level_values('Week'), return_index=True)
+            for week, chunk in zip(weeks, np.split(rows, starts[1:])):
+                shas.setdefault(week, hashlib.sha1(self.version.encode())).update(f'{k}:'.encode() + chunk.tobytes())
+        return {week: sha.hexdigest() for week, sha in shas.items()}
+
+    def get(self, week, fingerprint):
+        return self.weeks.get(week, {}).get(fingerprint)
+
+    def put(self, week, fingerprint, value):
+        entries = self.weeks.setdefault(week, {})
+        entries.pop(fingerprint, None)
+        entries[fingerprint] = value
+        for old in list(entries)[:-self.keep]:
+            del entries[old]
+
+    def save(self):
+        os.makedirs(self.folder, exist_ok=True)
+        temp = f'{self.path}.{os.getpid()}.tmp'
+        pd.to_pickle(self.weeks, temp)
+        os.replace(temp, self.path)
+
+    @property
+    def weeks(self):
+        if self._weeks is None:
+            self._weeks = pd.read_pickle(self.path) if os.path.exists(self.path) else {}
+        return self._weeks
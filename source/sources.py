@@ -0,0 +1,101 @@
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from source.workbook import Workbook
+
+
+class Source:
+    """
+    A tab of the tracker read from another file instead: an export of the timekeeping system, or another workbook
+        - the format follows the extension: .csv, .parquet, or .xlsx/.xlsm/.xls
+        - header: row of the column names in the file; the table then stands in for a tab whose header is its first
+          row, like TimeAndExpenseDetails. None reads a dump of the whole tab, laid out as in the tracker; the
+          cells of a CSV dump are typed back as the Excel parser would (numbers, whole numbers as int, ISO dates)
+        - columns: {name in the file: name in the tracker}, applied before dtypes
+        - dtypes: {column: dtype}, where 'datetime64[ns]' parses dates
+        - sheet: the tab to read from a workbook (default: the tab it stands in for)
+    """
+    formats = {'.csv': 'csv', '.parquet': 'parquet', '.pq': 'parquet', '.xlsx': 'excel', '.xlsm': 'excel',
+               '.xls': 'excel'}
+
+    def __init__(self, path, header=0, columns=None, dtypes=None, sheet=None):
+        self.path = path
+        self.header = header
+        self.columns = columns or {}
+        self.dtypes = dtypes or {}
+        self.sheet = sheet
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in self.formats:
+            raise ValueError(f'Unknown input format: {path}')
+        self.format = self.formats[extension]
+
+    @classmethod
+    def from_config(cls, config, folder=''):
+        """
+        {tab: Source} from JSON of {tab: {"path": ..., "header": ..., "columns": ..., "dtypes": ...}}
+            - config is either the JSON text itself (starting with '{') or the path of a JSON file
+            - relative paths are taken from folder, e.g. the input folder
+        """
+        if config.lstrip().startswith('{'):
+            config = json.loads(config)
+        else:
+            with open(config) as f:
+                config = json.load(f)
+        return {tab: cls(**{**options, 'path': os.path.join(folder, options['path'])})
+                for tab, options in config.items()}
+
+    @property
+    def signature(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime, stat.st_size
+
+    @property
+    def fingerprint(self):
+        sha = hashlib.sha1(repr((self.format, self.header, self.columns, self.dtypes, self.sheet)).encode())
+        with open(self.path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 ** 2), b''):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def frame(self, tab):
+        """The table with the tracker's column names and the configured dtypes, or the raw grid if header is None"""
+        if self.format == 'csv' and self.header is None:
+            df = self._cells(pd.read_csv(self.path, header=None, dtype=object))
+        elif self.format == 'csv':
+            df = pd.read_csv(self.path, header=self.header)
+        elif self.format == 'parquet':
+            df = pd.read_parquet(self.path)
+            if self.header is None:
+                df = df.set_axis(range(df.shape[1]), axis=1)
+        else:
+            df = Workbook.load(self.path).sheet(self.sheet or tab, header=self.header)
+        if self.header is None:
+            return df
+        df = df.rename(columns=self.columns)
+        for col, dtype in self.dtypes.items():
+            df[col] = pd.to_datetime(df[col], errors='coerce') if str(dtype).startswith('datetime') else \
+                df[col].astype(dtype)
+        return df
+
+    def grid(self, tab):
+        """The raw grid of the tab, as parsed from a tracker: no header, the column names (if any) on row 0"""
+        df = self.frame(tab)
+        if self.header is None:
+            return df
+        grid = np.vstack([df.columns.to_numpy(dtype=object), df.to_numpy(dtype=object)])
+        grid[pd.isna(grid)] = np.nan  # blank cells are NaN, as from the Excel parser, not None or NaT
+        return pd.DataFrame(grid)
+
+    # ---------- Helper Functions ----------
+    @staticmethod
+    def _cells(grid):
+        cells = pd.Series(grid.to_numpy(dtype=object).ravel())
+        numbers = pd.to_numeric(cells, errors='coerce')
+        dates = pd.to_datetime(cells.where(cells.str.fullmatch(r'\d{4}-\d{2}-\d{2}( 00:00:00)?', na=False)),
+                               errors='coerce')
+        is_number, is_date = numbers.notna(), dates.notna()
+        cells[is_number] = [int(x) if x.is_integer() else x for x in numbers[is_number]]
+        cells[is_date] = dates[is_date].tolist()
+        return pd.DataFrame(cells.to_numpy(dtype=object).reshape(grid.shape))
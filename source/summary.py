@@ -0,0 +1,51 @@
+import pandas as pd
+
+
+class HoursSummary:
+    """
+    Budgeted and charged hours by activity code (rows) by week ending date (columns)
+        - built from (Week, Name, Activity Code) hours Series, e.g. Validator.budgeted and Validator.charged
+        - both frames have the weeks with timesheets as columns: the budget is aligned on them by date, whatever
+          week range the staffing plan covers
+        - codes: the budget rows (default: the budgeted codes); charged rows are the charged codes
+    """
+
+    def __init__(self, budgeted, charged, codes=None):
+        self.weeks = pd.DatetimeIndex(sorted(pd.to_datetime(charged.index.unique('Week'))), name='Week')
+        self.charged = self._by_code_and_week(charged, self.weeks)
+        self.budget = self._by_code_and_week(budgeted, self.weeks)
+        if codes is not None:
+            self.budget = self.budget.reindex(self.budget.index.union(pd.Index(codes).dropna().unique()), fill_value=0)
+        self.budget.index.name = 'Activity Code'
+
+    @property
+    def codes(self):
+        return self.budget.index.union(self.charged.index)
+
+    @property
+    def unbudgeted(self):
+        """Charged hours above budget, as negative numbers; only the codes and weeks that have some"""
+        budget, charged = self.budget.reindex(self.codes, fill_value=0), self.charged.reindex(self.codes, fill_value=0)
+        diff = (budget - charged).clip(upper=0)
+        return diff.mask(diff == 0).dropna(how='all').dropna(how='all', axis=1)
+
+    @staticmethod
+    def table(frame, totals=True):
+        """A (code x week) frame as reported: weeks as 'YYYY-MM-DD', with a Total row and column if totals"""
+        res = frame.copy()
+        res.columns = [str(week)[:10] for week in res.columns]
+        if totals:
+            res.loc['Total'] = res.sum()
+            res['Total'] = res.sum(axis=1)
+        return res
+
+    # ---------- Helper Functions ----------
+    @staticmethod
+    def _by_code_and_week(hours, weeks):
+        # Weeks are the staffing plan's column headers: any that is not a date (e.g. a 'Total' column) is dropped
+        week = pd.to_datetime(hours.index.get_level_values('Week'), errors='coerce').rename('Week')
+        hours, week = hours[week.notna()], week[week.notna()]
+        if hours.empty:
+            return pd.DataFrame(0, index=pd.Index([], name='Activity Code'), columns=weeks)
+        df = hours.groupby([hours.index.get_level_values('Activity Code'), week]).sum()
+        return df.unstack('Week', fill_value=0).reindex(columns=weeks, fill_value=0)
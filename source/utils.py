@@ -1,13 +1,14 @@
-import itertools
+from collections.abc import Mapping
 import numpy as np
+import pandas as pd
 
 
 class Map:
 
     def __init__(self, df):
         self.df = df
-        self.loc = self._get_map()
-        self.finder = self._get_finder()
+        self.loc = df.to_numpy(dtype=object)  # loc[(i, j)] is the cell on row i, column j
+        self.finder = Finder(self.loc)
 
     def find(self, val, order=0):
         return self.finder[val][order]
@@ -21,30 +22,72 @@ class Map:
         return self.loc[tuple(map(sum, zip(self.find(val, order), direction)))]
 
     def get_values_below(self, title, index=0):
-        title_loc = self.find(title, index)
-        stuff = [[self.loc[(row, title_loc[1])], (row, title_loc[1])] for row in
-                 range(title_loc[0] + 1, self.df.shape[0])]
-        return list(itertools.dropwhile(lambda x: x[0] is None, stuff[::-1]))[::-1]
+        row, col = self.find(title, index)
+        return [[x, (row + 1 + i, col)] for i, x in enumerate(self.get_block(title, order=index)[:, 0].tolist())]
 
     def get_consecutive_value_below(self, title, index=0):
-        title_loc = self.find(title, index)
-        stuff = [[self.loc[(row, title_loc[1])], (row, title_loc[1])] for row in
-                 range(title_loc[0] + 1, self.df.shape[0])]
-        return list(itertools.takewhile(lambda x: not np.isnan(x[0]), stuff))
-
-    def _get_map(self):
-        row, col = self.df.shape
-        return {(i, j): self.df.iloc[i, j] for i in range(row) for j in range(col)}
-
-    def _get_finder(self):
-        res = {}
-        for loc in self.loc:
-            if self.loc[loc] is None:
-                continue
-            if self.loc[loc] not in res:
-                res[self.loc[loc]] = [loc]
-            else:
-                res[self.loc[loc]].append(loc)
-        for val in res:
-            res[val].sort()
-        return res
\ No newline at end of file
+        row, col = self.find(title, index)
+        block = self.get_block(title, order=index, stop='blank')
+        return [[x, (row + 1 + i, col)] for i, x in enumerate(block[:, 0].tolist())]
+
+    def get_block(self, anchor, shape=(None, 1), offset=(1, 0), stop='end', order=0, columns=None, frame=False):
+        """
+        The block of cells anchored at the order-th occurrence of anchor, cut in one slice
+            - offset: (rows, cols) from the anchor to the top-left cell of the block
+            - shape: (rows, cols) of the block. rows=None runs down the first column of the block until stop:
+                'end' keeps everything up to the last non-None cell of the sheet,
+                'blank' stops before the first None/NaN,
+                'label' stops before the first text cell
+            - columns: absolute column positions to take instead of the contiguous range given by offset and shape
+            - frame: return a DataFrame indexed by sheet positions instead of the object array
+        """
+        row, col = self.find(anchor, order)
+        top = row + offset[0]
+        columns = list(range(col + offset[1], col + offset[1] + shape[1])) if columns is None else list(columns)
+        n_rows = shape[0]
+        if n_rows is None:
+            n_rows = self._run_length(self.loc[top:, columns[0]], stop)
+        block = self.loc[top:top + n_rows, columns]
+        if frame:
+            return pd.DataFrame(block, index=range(top, top + len(block)), columns=columns)
+        return block
+
+    @staticmethod
+    def _run_length(cells, stop):
+        if stop == 'end':
+            filled = np.flatnonzero(np.not_equal(cells, None))
+            return filled[-1] + 1 if len(filled) else 0
+        if stop == 'blank':
+            hit = np.flatnonzero(pd.isna(cells))
+        elif stop == 'label':
+            hit = np.flatnonzero([isinstance(x, str) for x in cells])
+        else:
+            raise ValueError(f'Unknown stop condition: {stop}')
+        return hit[0] if len(hit) else len(cells)
+
+
+class Finder(Mapping):
+    """
+    Read-only index of value -> sorted list of (i, j) positions of a 2-D object grid
+        - cells are factorized in one pass and grouped with a stable argsort, so positions come out row-major
+        - blank cells (None / NaN) are not indexed
+    """
+
+    def __init__(self, grid):
+        codes, uniques = pd.factorize(grid.ravel())
+        order = np.argsort(codes, kind='stable')
+        order = order[np.searchsorted(codes[order], 0):]
+        self.rows, self.cols = np.divmod(order, grid.shape[1]) if grid.shape[1] else (order, order)
+        self.bounds = np.concatenate([[0], np.cumsum(np.bincount(codes[codes >= 0], minlength=len(uniques)))])
+        self.index = dict(zip(uniques, range(len(uniques))))
+
+    def __getitem__(self, val):
+        k = self.index[val]
+        start, end = self.bounds[k], self.bounds[k + 1]
+        return list(zip(self.rows[start:end].tolist(), self.cols[start:end].tolist()))
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+
+class WhatIf:
+    """
+    What-if staffing changes on one pricing scenario tab, evaluated in batches
+        - the team of a PricingAnalysisCollector is loaded once into rate, cost and (person x week) hours arrays
+        - a variant is a list of changes; all the variants of a batch are evaluated at once on (variant x person)
+          arrays, and only the weekly hours kept by a shift are looked up, from cumulative sums
+        - fees are the sheet's fees per person moved by the change in rate x hours, so an empty variant gives the
+          sheet's figures; the margin keeps the cost implied by the sheet's margin, moved by (hourly) base cost x hours
+    Changes, where who is a name, a list of names, or None for the whole team:
+        ('rate', who, factor)       discounted rate times factor
+        ('hours', who, factor)      weekly hours times factor
+        ('shift', who, weeks)       hours moved by weeks, later if weeks > 0; hours moved out of the plan are lost
+        ('remove', who)
+        ('code', who, code)         fees charged to another activity code
+        ('add', name, level, code, rate, base_cost, hours)    hours: one number per week, or one for every week
+    """
+
+    def __init__(self, collector):
+        pricing = collector.pricing
+        team = pricing['Team']
+        self.name = collector.name
+        self.names = team['Name'].to_numpy()
+        self.codes = team['Activity Code'].fillna('N/A').to_numpy()
+        self.rate, self.base_cost, self.fees = [team[col].fillna(0).to_numpy() for col in
+                                                ['Discounted Rate', 'Base Cost', 'Fees']]
+        self.hours = pricing['Hours']
+        self.total = float(pricing['Total Fees Discounted'])
+        self.margin = float(pricing['Margin (%) with Gignow'])
+
+    @property
+    def weeks(self):
+        return self.hours.shape[1]
+
+    def evaluate(self, variants):
+        """{label: [change, ...]} -> DataFrame by label of total fees, margin, and fees by activity code"""
+        changes = [change for variant in variants.values() for change in variant]
+        added = [change for change in changes if change[0] == 'add']
+        n, p = len(variants), len(self.names) + len(added)
+        names = np.concatenate([self.names, [str(change[1]) for change in added]])
+        code, code_names = pd.factorize(np.concatenate([self.codes, [change[3] for change in added],
+                                                        [change[2] for change in changes if change[0] == 'code']]))
+        code, code_names = np.tile(code[:p], (n, 1)), pd.Index(code_names)
+
+        hours = np.vstack([self.hours] + [np.broadcast_to(np.asarray(change[6], dtype=float), (self.weeks,))
+                                          for change in added])
+        rate_0 = np.concatenate([self.rate, [change[4] for change in added]]).astype(float)
+        base_cost = np.concatenate([self.base_cost, [change[5] for change in added]]).astype(float)
+        team = np.arange(p) < len(self.names)
+        keep, rate = np.tile(team.astype(float), (n, 1)), np.tile(rate_0, (n, 1))
+        scale, shift = np.ones((n, p)), np.zeros((n, p), dtype=int)
+
+        column = len(self.names)
+        for i, variant in enumerate(variants.values()):
+            for kind, *args in variant:
+                if kind == 'add':
+                    keep[i, column] = 1
+                    column += 1
+                    continue
+                rows = self._select(names, args[0])
+                if kind == 'rate':
+                    rate[i, rows] *= args[1]
+                elif kind == 'hours':
+                    scale[i, rows] *= args[1]
+                elif kind == 'shift':
+                    shift[i, rows] += args[1]
+                elif kind == 'remove':
+                    keep[i, rows] = 0
+                elif kind == 'code':
+                    code[i, rows] = code_names.get_loc(args[1])
+                else:
+                    raise ValueError(f'Unknown change: {kind}')
+
+        # Hours kept by a shift of k weeks are the first W - k weeks (k > 0) or the last W + k (k < 0)
+        cumulative = np.concatenate([np.zeros((p, 1)), hours.cumsum(axis=1)], axis=1)
+        lo, hi = np.clip(-shift, 0, self.weeks), self.weeks - np.clip(shift, 0, self.weeks)
+        person = np.arange(p)
+        new_hours = keep * scale * (cumulative[person, hi] - cumulative[person, lo])
+        old_hours = np.where(team, cumulative[:, -1], 0)
+
+        fees = keep * np.concatenate([self.fees, np.zeros(len(added))]) + rate * new_hours - keep * rate_0 * old_hours
+        total = fees.sum(axis=1) + self.total - self.fees.sum()
+        cost = (1 - self.margin) * self.total + (base_cost * new_hours).sum(axis=1) - base_cost @ old_hours
+        by_code = np.bincount((np.arange(n)[:, None] * len(code_names) + code).ravel(), weights=fees.ravel(),
+                              minlength=n * len(code_names)).reshape(n, len(code_names))
+
+        res = pd.DataFrame(by_code, index=pd.Index(list(variants), name='Variant'), columns=list(code_names))
+        res.insert(0, 'Total Fees Discounted', total)
+        res.insert(1, 'Delta_Fees', total - self.total)
+        res.insert(2, 'Margin (%) with Gignow', 1 - cost / total)
+        return res
+
+    # ---------- Helper Functions ----------
+    @staticmethod
+    def _select(names, who):
+        if who is None:
+            return np.ones(len(names), dtype=bool)
+        who = [who] if isinstance(who, str) else list(who)
+        missing = set(who) - set(names)
+        if missing:
+            raise ValueError(f'Unknown people: {", ".join(sorted(missing))}')
+        return np.isin(names, who)
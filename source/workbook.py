@@ -0,0 +1,303 @@
+import os
+import re
+import time
+import hashlib
+import zipfile
+import posixpath
+import itertools
+from xml.etree import ElementTree
+import openpyxl
+import pandas as pd
+from source.utils import Map
+from source.profiler import profiler
+
+_NS = {'main': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main',
+       'rel': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
+       'pkg': 'http://schemas.openxmlformats.org/package/2006/relationships'}
+
+
+class Workbook:
+    """
+    A tracker workbook shared by every app and collector in the process
+        - the file is opened once and each tab is parsed once, into its raw grid (no header)
+        - frames with a header row are cut from that raw grid, so different header offsets cost no extra parse
+        - instances are kept in memory by (path, mtime); saving the file again invalidates them, but when the
+          previous version was fingerprinted, the tabs whose content did not change carry over to the new instance
+          (parsed grids, frames read from the disk cache, Maps, aggregates) and `changed` lists the tabs that did
+        - every frame handed out is also persisted in cache_dir, keyed by (content hash, tab, header)
+          and cache_version, so a later run on the same file skips Excel parsing completely. Set cache_dir to None
+          to disable it.
+        - sources: {tab: Source} of the tabs read from other files (CSV, Parquet or another workbook, see
+          source.sources), which the apps see as tabs of the tracker; they are set per tracker by configure() and
+          are not cached on disk
+    """
+    _cache = {}
+    _configured = {}  # tracker path -> {tab: Source}, see configure()
+    cache_dir = os.environ.get('BUDGETING_CACHE', 'output/.cache')
+    cache_max_bytes = 512 * 1024 ** 2
+    cache_max_age = 7 * 24 * 3600
+    cache_version = '2'  # part of every cache file name: change it when what is read from a tab changes
+
+    def __init__(self, excel, sources=None):
+        self.excel = excel
+        self.sources = sources or {}
+        self._book = None
+        self._digest = None
+        self._fingerprints = None
+        self.raw = {}
+        self.frames = {}  # (tab, header) -> frame read from the disk cache
+        self.maps = {}
+        self.aggregates = {}
+        self.changed = None  # tabs that differ from the previous version of the file, if that one was fingerprinted
+
+    @classmethod
+    def load(cls, excel):
+        path = os.path.abspath(excel)
+        sources = cls._configured.get(path, {})
+        key = (path, os.path.getmtime(path)) + tuple((tab, source.signature) for tab, source in sources.items())
+        if key not in cls._cache:
+            workbook = cls(excel, sources)
+            stale = [k for k in cls._cache if k[0] == path]
+            if stale:
+                workbook._inherit(cls._cache[stale[-1]])
+            for k in stale:
+                del cls._cache[k]
+            cls._cache[key] = workbook
+        return cls._cache[key]
+
+    @classmethod
+    def configure(cls, excel, sources):
+        """Read the given {tab: Source} of the tracker excel from their own files from now on"""
+        cls._configured[os.path.abspath(excel)] = dict(sources)
+
+    @classmethod
+    def adopt(cls, cache, configured=None):
+        # Install workbooks parsed (and sources configured) by another process, e.g. as a process pool initializer.
+        # A forked worker shares the parent's open file handles: drop them, so that each process opens its own.
+        cls._cache.update(cache)
+        cls._configured.update(configured or {})
+        for workbook in cls._cache.values():
+            workbook._book = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_book'] = None
+        return state
+
+    @property
+    def book(self):
+        if self._book is None:
+            self._book = pd.ExcelFile(self.excel)
+        return self._book
+
+    @property
+    def digest(self):
+        if self._digest is None:
+            sha = hashlib.sha1()
+            with open(self.excel, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 ** 2), b''):
+                    sha.update(chunk)
+            self._digest = sha.hexdigest()
+        return self._digest
+
+    @property
+    def fingerprints(self):
+        """{tab: hash of what its parsed grid depends on}: the tab's cells, the shared strings they use, styles"""
+        if self._fingerprints is None:
+            with zipfile.ZipFile(self.excel) as package:
+                parts = self.sheet_parts(package)
+                strings = self._shared_strings(package)
+                common = hashlib.sha1(package.read('xl/styles.xml') if 'xl/styles.xml' in package.namelist() else b'')
+                common.update(b'1904' if re.search(rb'date1904="(1|true)"', package.read('xl/workbook.xml')) else b'')
+                self._fingerprints = {}
+                for name, part in parts.items():
+                    xml = re.sub(rb'<sheetViews>.*?</sheetViews>', b'', package.read(part), flags=re.S)
+                    sha = common.copy()
+                    sha.update(xml)
+                    for j in re.findall(rb'<c [^>]*?t="s"[^>]*>\s*<v>(\d+)</v>', xml):
+                        sha.update(strings[int(j)].encode() + b'\0')
+                    self._fingerprints[name] = sha.hexdigest()
+            self._fingerprints.update({name: source.fingerprint for name, source in self.sources.items()})
+        return self._fingerprints
+
+    @staticmethod
+    def sheet_parts(package):
+        """{tab: path of its XML part} of an opened .xlsx package"""
+        workbook = ElementTree.fromstring(package.read('xl/workbook.xml'))
+        rels = ElementTree.fromstring(package.read('xl/_rels/workbook.xml.rels'))
+        targets = {r.get('Id'): r.get('Target') for r in rels.iter(f"{{{_NS['pkg']}}}Relationship")}
+        parts = {}
+        for sheet in workbook.iter(f"{{{_NS['main']}}}sheet"):
+            target = targets[sheet.get(f"{{{_NS['rel']}}}id")]
+            parts[sheet.get('name')] = target.lstrip('/') if target.startswith('/') else \
+                posixpath.normpath(posixpath.join('xl', target))
+        return parts
+
+    def map(self, name, header=0):
+        """The Map of a tab, built once per instance; Maps are only read, so every collector shares it"""
+        if (name, header) not in self.maps:
+            self.maps[(name, header)] = Map(self.sheet(name, header=header))
+        return self.maps[(name, header)]
+
+    def sheet(self, name, header=0):
+        if name in self.sources:
+            if name not in self.raw:
+                with profiler.stage('read source', sheet=name):
+                    self.raw[name] = self.sources[name].grid(name)
+            return self._with_header(self.raw[name], header)
+        if (name, header) in self.frames:
+            return self.frames[(name, header)].copy()
+        cached = self._cache_file(name, header)
+        if cached and os.path.exists(cached):
+            os.utime(cached)
+            with profiler.stage('read cache', sheet=name):
+                self.frames[(name, header)] = pd.read_pickle(cached)
+            return self.frames[(name, header)].copy()
+        if name not in self.raw:
+            with profiler.stage('parse', sheet=name):
+                self.raw[name] = self.book.parse(name, header=None)
+        df = self._with_header(self.raw[name], header)
+        if cached:
+            self._store(df, cached)
+        return df
+
+    def aggregate(self, name, keys, value, since=None, chunk_size=20000):
+        """
+        Sum of the value column by the key columns of a tab whose header is its first row, streamed in chunks
+            - rows come from a read-only row iterator and only the key and value columns are kept
+            - rows whose first key is before `since` are dropped as they are read
+            - each chunk is folded into the running aggregate, so peak memory follows the aggregate, not the tab
+            - a tab read from a Source is summed from its frame in one go
+        """
+        tag = 'sum-' + hashlib.sha1(repr((keys, value, since)).encode()).hexdigest()[:8]
+        if (name, tag) in self.aggregates:
+            return self.aggregates[(name, tag)].copy()
+        if name in self.sources:
+            with profiler.stage('aggregate', sheet=name):
+                df = self.sources[name].frame(name)[keys + [value]]
+                df[value] = pd.to_numeric(df[value], errors='coerce')
+                if since is not None:
+                    df[keys[0]] = pd.to_datetime(df[keys[0]], errors='coerce')
+                    df = df[df[keys[0]] >= since]
+                self.aggregates[(name, tag)] = df.groupby(keys)[value].sum().reset_index()
+            return self.aggregates[(name, tag)].copy()
+        cached = self._cache_file(name, tag)
+        if cached and os.path.exists(cached):
+            os.utime(cached)
+            self.aggregates[(name, tag)] = pd.read_pickle(cached)
+            return self.aggregates[(name, tag)].copy()
+
+        with profiler.stage('aggregate', sheet=name):
+            book = openpyxl.load_workbook(self.excel, read_only=True, data_only=True)
+            rows = book[name].iter_rows(values_only=True)
+            header = list(next(rows))
+            columns = [header.index(col) for col in keys + [value]]
+            res = None
+            for chunk in iter(lambda: list(itertools.islice(rows, chunk_size)), []):
+                # without a <dimension> in the sheet, rows are not padded to its width: the cells past the end are blank
+                df = pd.DataFrame([[row[j] if j < len(row) else None for j in columns] for row in chunk],
+                                  columns=keys + [value])
+                df[value] = pd.to_numeric(df[value], errors='coerce')
+                if since is not None:
+                    df[keys[0]] = pd.to_datetime(df[keys[0]], errors='coerce')
+                    df = df[df[keys[0]] >= since]
+                df = df.groupby(keys)[value].sum()
+                res = df if res is None else pd.concat([res, df]).groupby(level=list(range(len(keys)))).sum()
+            book.close()
+
+        if res is None:  # no data rows
+            res = pd.DataFrame(columns=keys + [value]).astype({value: float})
+        else:
+            res = res.reset_index()
+            res.columns = keys + [value]
+        self.aggregates[(name, tag)] = res
+        if cached:
+            self._store(res, cached)
+        return res.copy()
+
+    def preload(self, sheets):
+        """
+        Parse the raw grids of all the given tabs in one read, except those already in memory or on disk
+            - sheets: {tab: [header, ...]} of the frames that will be asked for; a tab is skipped only when
+              every one of them is cached on disk
+        """
+        for name in set(sheets) & set(self.sources):
+            self.sheet(name, header=None)
+        names = [name for name, headers in sheets.items() if name not in self.raw and name not in self.sources and
+                 not all(self._cache_file(name, header) and os.path.exists(self._cache_file(name, header))
+                         for header in headers)]
+        if names:
+            with profiler.stage('parse', sheet=', '.join(names)):
+                self.raw.update(self.book.parse(sheet_name=names, header=None))
+        return self
+
+    # ---------- Helper Functions ----------
+    def _inherit(self, old):
+        # Take over what old parsed from the tabs that are the same in this version of the file
+        if old._fingerprints is None:
+            return
+        new = self.fingerprints
+        self.changed = sorted(name for name in set(new) | set(old.fingerprints)
+                              if new.get(name) != old.fingerprints.get(name))
+        self.raw = {name: df for name, df in old.raw.items() if name not in self.changed}
+        self.frames = {key: df for key, df in old.frames.items() if key[0] not in self.changed}
+        self.maps = {key: m for key, m in old.maps.items() if key[0] not in self.changed}
+        self.aggregates = {key: df for key, df in old.aggregates.items() if key[0] not in self.changed}
+
+    @staticmethod
+    def _shared_strings(package):
+        if 'xl/sharedStrings.xml' not in package.namelist():
+            return []
+        root = ElementTree.fromstring(package.read('xl/sharedStrings.xml'))
+        return [''.join(t.text or '' for t in si.iter(f"{{{_NS['main']}}}t"))
+                for si in root.iter(f"{{{_NS['main']}}}si")]
+
+    @staticmethod
+    def _with_header(raw, header):
+        if header is None:
+            return raw.copy()
+        columns, seen = [], {}
+        for j, col in enumerate(raw.iloc[header]):
+            col = f'Unnamed: {j}' if pd.isna(col) else col
+            if col in seen:
+                seen[col] += 1
+                col = f'{col}.{seen[col]}'
+            else:
+                seen[col] = 0
+            columns.append(col)
+        df = raw.iloc[header + 1:].reset_index(drop=True)
+        df.columns = columns
+        return df.infer_objects()
+
+    def _cache_file(self, name, header):
+        if not self.cache_dir:
+            return None
+        os.makedirs(self.cache_dir, exist_ok=True)
+        return os.path.join(self.cache_dir, f'{self.digest}-v{self.cache_version}-{name}-{header}.pkl')
+
+    def _store(self, df, cached):
+        temp = f'{cached}.{os.getpid()}.tmp'
+        df.to_pickle(temp)
+        os.replace(temp, cached)
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for file_name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, file_name)
+            if file_name.endswith('.pkl'):
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:  # evicted by another process meanwhile
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in entries:
+            if mtime > time.time() - self.cache_max_age and total <= self.cache_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:  # evicted by another process meanwhile
+                pass
+            total -= size
@@ -0,0 +1,25 @@
+import os
+import pytest
+from benchmarks.tracker import make_tracker
+from source.workbook import Workbook
+
+TRACKER = 'Budget Tracker 1005.xlsx'
+
+
+@pytest.fixture(autouse=True)
+def no_disk_cache(monkeypatch):
+    monkeypatch.setattr(Workbook, 'cache_dir', None)
+    monkeypatch.setattr(Workbook, '_cache', {})
+
+
+@pytest.fixture(scope='session')
+def input_dir(tmp_path_factory):
+    """A folder holding a small synthetic tracker, see benchmarks.tracker"""
+    folder = tmp_path_factory.mktemp('input')
+    make_tracker(os.path.join(folder, TRACKER), employees=12, weeks=9, codes=3, scenarios=3)
+    return os.path.join(folder, '')
+
+
+@pytest.fixture
+def output_dir(tmp_path):
+    return os.path.join(tmp_path, '')
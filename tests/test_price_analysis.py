@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+from apps import PricingAnalysis
+from source.collectors import PricingAnalysisCollector
+from tests.conftest import TRACKER
+
+
+def team(rows, hours):
+    # rows of (name, code, fees); the other columns are the same for everyone
+    df = pd.DataFrame([[name, 'A', code, 100.0, 50.0, pd.Timestamp('2020-03-06'), pd.Timestamp('2020-12-11'), fees]
+                       for name, code, fees in rows], columns=PricingAnalysisCollector.team_columns)
+    return PricingAnalysis._team_table(df, np.array(hours, dtype=float))
+
+
+def test_team_keeps_named_rows_only(input_dir):
+    collector = PricingAnalysisCollector(input_dir + TRACKER, 'Tech')
+    team, hours = collector.pricing['Team'], collector.pricing['Hours']
+    assert team['Name'].notna().all() and 'Total' not in set(team['Activity Code'])
+    assert hours.dtype == float and hours.flags['C_CONTIGUOUS'] and hours.shape[0] == len(team)
+    assert team['Fees'].dtype == float and str(team['Start Date'].dtype).startswith('datetime64')
+
+
+def test_change_log_between_scenarios(input_dir, output_dir):
+    app = PricingAnalysis(TRACKER, tabs=('Gignow', 'Tech'), input_dir=input_dir, output_dir=output_dir)
+    added, modified, switched = next(app._changes())[3]
+    assert added['Name'].tolist() == ['New Joiner']
+    (team_1, hours_1), (team_2, hours_2) = app.teams
+    pairs = team_2.merge(team_1, on=['Name', 'Activity Code'], suffixes=('', '_1'))
+    expected = {(r['Name'], r['Activity Code']) for r in pairs.to_dict('records')
+                if any(hours_2[r['Row']] != hours_1[r['Row_1']])}
+    assert set(zip(modified['Name'], modified['Activity Code'])) == expected
+    assert len(switched)  # the 3rd person is on another code in Gignow
+
+
+def test_a_blank_activity_code_is_not_a_switch():
+    before = team([('X', np.nan, 0.0), ('X', 'Code A', 100.0)], [[1, 1], [2, 2]])
+    after = team([('X', np.nan, 0.0), ('X', 'Code A', 100.0)], [[1, 1], [2, 2]])
+    added, modified, switched = PricingAnalysis._diff_teams(before, after, 'Before', 'After')
+    assert added.empty and modified.empty and switched.empty
+
+
+def test_a_switch_lists_every_code_whose_fees_changed():
+    before = team([('X', 'Code A', 100.0), ('Y', 'Code A', 100.0)], [[2, 2], [2, 2]])
+    after = team([('X', 'Code B', 100.0), ('Y', 'Code A', 100.0)], [[2, 2], [2, 2]])
+    added, modified, switched = PricingAnalysis._diff_teams(before, after, 'Before', 'After')
+    assert added.empty and modified.empty
+    # as in the original change log, a code the person left shows its fees before, not their negative
+    assert switched[['Name', 'Activity Code', 'Delta_Fees']].values.tolist() == [['X', 'Code A', 100.0],
+                                                                                  ['X', 'Code B', 100.0]]
@@ -0,0 +1,72 @@
+import os
+import shutil
+import zipfile
+import datetime
+import openpyxl
+import pandas as pd
+import pytest
+from source import refresh
+from source.workbook import Workbook
+from tests.conftest import TRACKER
+
+TAB = 'TimeAndExpenseDetails'
+
+
+def parts(path):
+    with zipfile.ZipFile(path) as package:
+        return {item.filename: package.read(item.filename) for item in package.infolist()}
+
+
+def export(folder, rows, columns):
+    # A timesheet export as the timekeeping system writes it: a few lines of title above the header on row 5
+    os.makedirs(folder)
+    book = openpyxl.Workbook()
+    sheet = book.active
+    for line in ['Time and Expense Details', 'Project: synthetic', None, None]:
+        sheet.append([line])
+    sheet.append(columns)
+    for row in rows:
+        sheet.append(row)
+    book.save(os.path.join(folder, 'TimeAndExpenseDetails 1012.xlsx'))
+
+
+@pytest.fixture
+def tracker(input_dir, tmp_path):
+    path = str(tmp_path / TRACKER)
+    shutil.copyfile(input_dir + TRACKER, path)
+    return path
+
+
+@pytest.mark.parametrize('fallback', [False, True])
+def test_refresh_appends_the_new_weeks_only(tracker, tmp_path, monkeypatch, fallback):
+    if fallback:  # a sheet whose XML cannot be edited in place is appended to by openpyxl
+        monkeypatch.setattr(refresh, '_append_to_sheet_xml', lambda xml, rows: None)
+    before, original = pd.read_excel(tracker, TAB), parts(tracker)
+    last = before['Week Ending Date'].max().to_pydatetime()
+    new = [[last + datetime.timedelta(days=7), 'Ann <Lee> & Co', 'Design, phase 2', 900001, 'P-1', 150.5, 7.25, 'T'],
+           [last + datetime.timedelta(days=14, hours=13, minutes=45), 'Zoë Ortiz', 'Build', 900002, 'P-1', 99.0,
+            40.0, 'T']]
+    known = [[last, 'Someone Else', 'Build', 900003, 'P-1', 99.0, 8.0, 'T']]
+    columns = list(before.columns)
+    # the export's columns are matched by name: reorder them and add one the tracker does not have
+    order = [columns.index(col) for col in reversed(columns)]
+    export(str(tmp_path / 'TimeExp'), [[row[j] for j in order] + ['extra'] for row in known + new],
+           [columns[j] for j in order] + ['Comment'])
+
+    log = refresh.refresh_timesheets(tracker, str(tmp_path / 'TimeExp'), TAB)
+    assert '2 rows added' in log
+
+    after = pd.read_excel(tracker, TAB)
+    expected = pd.concat([before, pd.DataFrame(new, columns=columns)], ignore_index=True)
+    pd.testing.assert_frame_equal(after, expected, check_dtype=False)
+    assert after['Week Ending Date'].tolist()[-2:] == [pd.Timestamp(row[0]) for row in new]
+    assert after['Employee Name'].tolist()[-2:] == ['Ann <Lee> & Co', 'Zoë Ortiz']
+    if not fallback:
+        part = Workbook.sheet_parts(zipfile.ZipFile(tracker))[TAB]
+        patched = parts(tracker)
+        assert list(patched) == list(original)
+        assert {name for name in original if patched[name] != original[name]} == {part}
+
+    Workbook._cache.clear()
+    assert 'up to date' in refresh.refresh_timesheets(tracker, str(tmp_path / 'TimeExp'), TAB)
+    pd.testing.assert_frame_equal(pd.read_excel(tracker, TAB), after)
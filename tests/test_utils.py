@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+from source.utils import Map
+from source.workbook import Workbook
+from tests.conftest import TRACKER
+
+
+def naive_finder(grid):
+    # value -> row-major positions, scanning every cell as the original Map did
+    res = {}
+    for i in range(grid.shape[0]):
+        for j in range(grid.shape[1]):
+            if not pd.isna(grid[i, j]):
+                res.setdefault(grid[i, j], []).append((i, j))
+    return res
+
+
+@pytest.mark.parametrize('tab, header', [('Bill', 0), ('Tech', 0), ('Gignow', 0), ('Burn Chart', None)])
+def test_finder_matches_a_cell_by_cell_scan(input_dir, tab, header):
+    m = Map(Workbook.load(input_dir + TRACKER).sheet(tab, header=header))
+    expected = naive_finder(m.loc)
+    assert set(m.finder) == set(expected)
+    for val, positions in expected.items():
+        assert m.finder[val] == positions
+
+
+def test_finder_skips_blanks_and_keeps_row_major_order():
+    m = Map(pd.DataFrame(np.array([['a', None, 'b'], [np.nan, 'a', 'a']], dtype=object)))
+    assert m.finder['a'] == [(0, 0), (1, 1), (1, 2)]
+    assert m.find('a', 1) == (1, 1)
+    assert len(m.finder) == 2
+
+
+def test_get_block_stops():
+    m = Map(pd.DataFrame(np.array([['Rate', 'x'], [1.0, None], [np.nan, None], ['Total', None], [3.0, None]],
+                                  dtype=object)))
+    assert m.get_block('Rate')[:, 0].tolist()[-1] == 3.0
+    assert m.get_block('Rate', stop='blank')[:, 0].tolist() == [1.0]
+    assert m.get_block('Rate', stop='label')[:, 0].tolist()[:1] == [1.0]
+    assert len(m.get_block('Rate', stop='label')) == 2
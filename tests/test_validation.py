@@ -0,0 +1,88 @@
+import os
+import time
+import shutil
+import pandas as pd
+import pytest
+from apps import Validator
+from source.snapshots import SnapshotStore
+from tests.conftest import TRACKER
+
+
+def nested_loop_discrepancies(app):
+    # The original week -> name -> code comparison, over the weeks with timesheets
+    charged, budget = app.ts_summary, app.staffing_summary
+    over, under, wrong = set(), set(), set()
+    for week in charged:
+        for name in set(charged[week]) | set(budget.get(week, {})):
+            c, b = charged[week].get(name, {}), budget.get(week, {}).get(name, {})
+            rows = [(week, name, code, b.get(code, 0), c.get(code, 0)) for code in set(c) | set(b)]
+            o = {r for r in rows if r[4] > r[3]}
+            u = {r for r in rows if r[4] < r[3]}
+            over |= o
+            under |= u
+            if o and u:
+                wrong |= o | u
+    return over, under, wrong
+
+
+def rows(df):
+    return {(r['Week'], r['Name'], r['Activity Code'], r['Budgeted Hours'], r['Charged Hours'])
+            for r in df.to_dict('records')}
+
+
+def test_discrepancies_match_the_nested_loop_comparison(input_dir, output_dir):
+    app = Validator(TRACKER, input_dir=input_dir, output_dir=output_dir)
+    df = app.get_discrepancies()
+    over, under, wrong = nested_loop_discrepancies(app)
+    assert over and under and wrong  # the synthetic tracker has some of each
+    assert rows(df[df['Discrepancy'] == 'Over-charge']) == over
+    assert rows(df[df['Discrepancy'] == 'Under-charge']) == under
+    assert rows(df[df['Possibly Wrong Code']]) == wrong
+
+
+def test_week_cache_recomputes_only_the_changed_weeks(input_dir, output_dir, monkeypatch):
+    full = Validator(TRACKER, input_dir=input_dir, output_dir=output_dir).get_discrepancies(lines=True)
+
+    computed = []
+    original = Validator._discrepancies
+    monkeypatch.setattr(Validator, '_discrepancies', lambda self, weeks: computed.append(list(weeks)) or
+                        original(self, weeks))
+    app = Validator(TRACKER, input_dir=input_dir, output_dir=output_dir)
+    pd.testing.assert_frame_equal(app.get_discrepancies(lines=True), full)
+    assert computed == []
+
+    week = app.charged.index.get_level_values('Week')[0]
+    app.charged.iloc[0] += 1
+    df = app.get_discrepancies(lines=True)
+    assert computed == [[week]]
+    pd.testing.assert_frame_equal(df, original(app, sorted(app.charged.index.unique('Week'))))
+
+
+def test_run_report_without_save_writes_nothing(input_dir, output_dir, monkeypatch):
+    monkeypatch.setattr(Validator, 'echo', False)
+    app = Validator(TRACKER, input_dir=input_dir, output_dir=output_dir)
+    app.run_report(save=False)
+    assert os.listdir(output_dir) == []
+    assert len(app.discrepancies) == len(app.get_discrepancies(save=False))
+
+
+def test_comparison_snapshots_only_the_totals_of_the_old_tracker(input_dir, tmp_path, monkeypatch):
+    folder, output_dir = tmp_path / 'input', os.path.join(tmp_path, 'output', '')
+    folder.mkdir()
+    shutil.copyfile(input_dir + TRACKER, folder / TRACKER)
+    shutil.copyfile(input_dir + TRACKER, folder / 'Budget Tracker 0928.xlsx')
+    app = Validator(TRACKER, input_dir=os.path.join(folder, ''), output_dir=output_dir)
+    monkeypatch.setattr(Validator, '_discrepancies', lambda self, weeks: pytest.fail('discrepancies computed'))
+    app._compare('Budget Tracker 0928.xlsx')
+    key = SnapshotStore.key(str(folder / 'Budget Tracker 0928.xlsx'))
+    assert app.snapshots.dates() == [key] and set(app.snapshots.load(key)) == {'total', 'charged', 'budgeted'}
+    assert not os.path.exists(output_dir + '.weeks')
+
+
+def test_snapshot_key_has_the_year_the_tracker_was_saved_in(tmp_path):
+    path = str(tmp_path / 'Budget Tracker 1231.xlsx')
+    open(path, 'w').close()
+    os.utime(path, (time.mktime((2021, 1, 4, 12, 0, 0, 0, 0, -1)),) * 2)
+    assert SnapshotStore.key(path) == '20201231'
+    os.utime(path, (time.mktime((2021, 12, 30, 12, 0, 0, 0, 0, -1)),) * 2)
+    assert SnapshotStore.key(path) == '20211231'
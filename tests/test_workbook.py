@@ -0,0 +1,33 @@
+import re
+import zipfile
+import openpyxl
+import pandas as pd
+from source.workbook import Workbook
+
+
+def strip_dimension(path):
+    # Rewrite the workbook without the <dimension> element of its sheets, as some exporters write it
+    with zipfile.ZipFile(path) as z:
+        parts = {info: z.read(info) for info in z.infolist()}
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as z:
+        for info, data in parts.items():
+            if info.filename.startswith('xl/worksheets/'):
+                data = re.sub(rb'<dimension [^>]*/>', b'', data)
+            z.writestr(info, data)
+
+
+def test_aggregate_reads_short_rows_without_a_dimension(tmp_path):
+    path = str(tmp_path / 'export.xlsx')
+    book = openpyxl.Workbook()
+    sheet = book.active
+    sheet.title = 'TimeAndExpenseDetails'
+    for row in [['Week', 'Name', 'Code', 'Hours'], ['W1', 'A', 'X', 8], ['W1', 'A', 'X', 2], ['W2', 'B'],
+                ['W2', 'B', 'Y', 4]]:
+        sheet.append(row)
+    book.save(path)
+    strip_dimension(path)
+    assert b'<dimension' not in zipfile.ZipFile(path).read('xl/worksheets/sheet1.xml')
+
+    res = Workbook(path).aggregate('TimeAndExpenseDetails', ['Week', 'Name', 'Code'], 'Hours')
+    expected = pd.read_excel(path).groupby(['Week', 'Name', 'Code'])['Hours'].sum().reset_index()
+    pd.testing.assert_frame_equal(res, expected, check_dtype=False)